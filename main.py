@@ -1,161 +1,3086 @@
+import array
+import atexit
+import bisect
+import bz2
+import collections
+import contextlib
 import csv
+import datetime
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import lzma
+import math
+import mmap
 import os
+import random
+import signal
+import struct
+import sys
+import threading
+import time
+import unicodedata
+
+try:
+    import readline
+except ImportError:
+    ## readline no está disponible en todas las plataformas (por ejemplo
+    ## Windows); sin él los nombres se piden sin autocompletado.
+    readline = None
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    ## Sin memoria compartida (Python < 3.8 o plataformas sin soporte) no
+    ## se pueden publicar los países para otros procesos.
+    resource_tracker = None
+    shared_memory = None
 
 nombre_archivo = "paises.csv"
 
-# ================================================
-#  Funciones para cargar y guardar datos de países
-# ================================================
+## Estado de la carga en segundo plano. "terminada" arranca marcada para que
+## las funciones que esperan la carga no se bloqueen si nunca se inició una.
+## "error" describe por qué la lectura quedó incompleta (None si no falló);
+## mientras esté puesto no se guarda nada, para no pisar el archivo.
+estado_carga = {
+    "hilo": None,
+    "terminada": threading.Event(),
+    "pendientes": [],
+    "candado": threading.RLock(),
+    "error": None,
+}
+estado_carga["terminada"].set()
+
+## Índices y resúmenes que se mantienen al día con cada alta o cambio,
+## para no tener que recorrer todos los países. "lista" es la lista de
+## países a partir de la cual fueron construidos. "generacion" aumenta
+## con cada cambio en los datos (ver nueva_generacion()).
+indices = {
+    "lista": None,
+    "continentes": {},
+    "nombres": {},
+    "nombres_ordenados": [],
+    "generacion": 0,
+}
+
+## Cantidad máxima de sugerencias que muestra el autocompletado
+LIMITE_SUGERENCIAS = 50
+
+## Árboles k-d para buscar países parecidos (ver coordenadas_similitud()).
+## "arboles" es {continente normalizado: árbol}, "nodos" es {id del país:
+## nodo} y "lista" la lista de países con la que se armaron.
+similitud = {
+    "lista": None,
+    "arboles": {},
+    "nodos": {},
+}
+
+## Países publicados en memoria compartida por este proceso (ver
+## publicar_paises()). "control" y "datos" son los segmentos abiertos;
+## "candado" evita que el menú y el hilo de guardado publiquen a la vez.
+memoria_compartida = {
+    "prefijo": None,
+    "control": None,
+    "datos": None,
+    "version": 0,
+    "candado": threading.Lock(),
+}
+
+## Caché de resultados de búsquedas y filtros, de a lo sumo CAPACIDAD_CACHE
+## consultas (se descartan las usadas hace más tiempo). "generacion" es la
+## generación de los datos con la que se calcularon las entradas guardadas;
+## si los datos cambiaron, se descartan todas.
+CAPACIDAD_CACHE = 128
+cache_consultas = {
+    "entradas": collections.OrderedDict(),
+    "generacion": 0,
+    "aciertos": 0,
+    "fallos": 0,
+}
+
+## Estado del almacenamiento por continente (un archivo por continente y un
+## manifiesto). "directorio" sólo tiene valor si la sesión usa fragmentos;
+## "cargados" y "modificados" son claves de continente normalizadas.
+MANIFIESTO = "manifiesto.json"
+estado_fragmentos = {
+    "directorio": None,
+    "cargados": set(),
+    "modificados": set(),
+}
+
+## Historial por año de población y superficie, guardado aparte del CSV
+## principal. "series" es {nombre normalizado: {campo: serie}}; ver
+## nueva_serie() para el formato de cada serie.
+historial = {
+    "series": {},
+    "modificado": False,
+}
+
+## Bajas pendientes de compactar: "en_memoria" son los países marcados que
+## siguen en la lista y "en_registro" los nombres anotados en el registro
+## de bajas del archivo (ver registrar_baja()).
+estado_bajas = {
+    "en_memoria": 0,
+    "en_registro": 0,
+}
+
+## Guardado diferido: las altas y cambios sólo marcan que hay datos sin
+## guardar, y un hilo los guarda todos juntos cuando pasan ESPERA_GUARDADO
+## segundos sin cambios nuevos (o ESPERA_MAXIMA desde el primero).
+## "ocupado" cuenta las operaciones del hilo principal que SIGTERM no debe
+## cortar por la mitad (ver sin_interrupciones()) y "salir" indica que la
+## señal llegó durante una de ellas.
+ESPERA_GUARDADO = 2.0
+ESPERA_MAXIMA = 10.0
+estado_guardado = {
+    "hilo": None,
+    "pendiente": threading.Event(),
+    "primer_cambio": 0.0,
+    "ultimo_cambio": 0.0,
+    "archivo": None,
+    "lista": None,
+    "candado": threading.Lock(),
+    "ocupado": 0,
+    "salir": False,
+}
+
+# ================================================
+#  Funciones para cargar y guardar datos de países
+# ================================================
+
+## Extensiones de archivo comprimido y la función que las abre
+COMPRESORES = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+def abrir_archivo(nombre_archivo, modo):
+    """
+    Abre un archivo para leer o escribir ("r", "w", "rb" o "wb").
+
+    Si la extensión es .gz, .bz2 o .xz el archivo se comprime o
+    descomprime al vuelo, sin cargarlo entero en memoria. Los modos de
+    texto usan UTF-8 y newline='' (como necesita el módulo csv).
+    """
+    extension = os.path.splitext(nombre_archivo)[1].lower()
+    abrir = COMPRESORES.get(extension)
+    if abrir is None:
+        if "b" in modo:
+            return open(nombre_archivo, mode=modo)
+        return open(nombre_archivo, mode=modo, encoding='utf-8', newline='')
+    if "b" in modo:
+        return abrir(nombre_archivo, modo)
+    return abrir(nombre_archivo, modo + "t", encoding='utf-8', newline='')
+
+def extension_sin_compresion(nombre_archivo):
+    """
+    Retorna la extensión del archivo ignorando la de compresión
+    (por ejemplo "csv" para "datos.csv.gz").
+    """
+    base, extension = os.path.splitext(nombre_archivo)
+    if extension.lower() in COMPRESORES:
+        extension = os.path.splitext(base)[1]
+    return extension.lstrip(".").lower()
+
+
+def leer_paises(nombre_archivo, continentes=None, omitir_repetidos=True, bajas=None):
+    """
+    Recorre el archivo CSV y devuelve (con yield) cada país válido.
+
+    Valida la existencia del archivo y el formato numérico de
+    población y superficie. Las filas inválidas y los nombres repetidos
+    se informan y se omiten. El archivo puede estar comprimido.
+
+    Si "nombre_archivo" es un directorio con almacenamiento por continente
+    se leen sus fragmentos (sólo los de "continentes", si se indican).
+
+    Con omitir_repetidos=False no se controlan los nombres repetidos y
+    la lectura no guarda nada en memoria.
+
+    Se omiten los países anotados en el registro de bajas del archivo
+    (o los nombres normalizados de "bajas", si se indican).
+    """
+    if es_particionado(nombre_archivo):
+        manifiesto = leer_manifiesto(nombre_archivo)
+        bajas_por_fragmento = leer_bajas(nombre_archivo)
+        for clave in claves_de_fragmentos(manifiesto, continentes):
+            fragmento = manifiesto["fragmentos"][clave]
+            bajas = {nombre for nombre, continente in bajas_por_fragmento if continente == clave}
+            yield from leer_paises(os.path.join(nombre_archivo, fragmento["archivo"]),
+                                   omitir_repetidos=omitir_repetidos, bajas=bajas)
+        return
+    if not os.path.isfile(nombre_archivo):
+        return
+    if bajas is None:
+        bajas = {nombre for nombre, _ in leer_bajas(nombre_archivo)}
+    vistos = set()
+    with abrir_archivo(nombre_archivo, "r") as archivo:
+        lector_csv = csv.DictReader(archivo)
+
+        for fila in lector_csv:
+            pais = fila_a_pais(fila)
+            if pais is None:
+                continue
+            if bajas and pais['nombre'].strip().lower() in bajas:
+                continue
+
+            if not omitir_repetidos:
+                yield pais
+                continue
+
+            # Valida que el país no esté repetido
+            nombre_normalizado = pais['nombre'].strip().lower()
+            if nombre_normalizado in vistos:
+                print(f"Error: El país '{pais['nombre']}' está repetido. Omitiendo.")
+                continue
+            vistos.add(nombre_normalizado)
+            yield pais
+
+def error_de_fila(fila):
+    """
+    Valida una fila leída del CSV (un diccionario de textos) sin mostrar
+    nada. Retorna el mensaje de error, o None si la fila es válida.
+    """
+    # Valida si los campos no estan vacíos
+    if not fila.get('nombre') or not fila.get('poblacion') or not fila.get('superficie') or not fila.get('continente'):
+        return f"La fila con nombre '{fila.get('nombre')}' tiene campos vacíos."
+
+    # Valida si son datos numéricos
+    if not fila['poblacion'].isdigit() or not fila['superficie'].isdigit():
+        return f"La fila para '{fila['nombre']}' contiene datos no numéricos."
+    return None
+
+def fila_a_pais(fila):
+    """
+    Valida una fila leída del CSV (un diccionario de textos) y la
+    convierte en el diccionario del país. Si la fila no es válida
+    informa el error y retorna None.
+    """
+    error = error_de_fila(fila)
+    if error is not None:
+        print(f"Error: {error} Omitiendo.")
+        return None
+
+    # Si todas las validaciones pasan, creamos el diccionario
+    pais = {
+        "nombre": fila['nombre'],
+        "poblacion": int(fila['poblacion']),
+        "superficie": int(fila['superficie']),
+        "continente": fila['continente']
+    }
+    return pais
+
+def cargar_paises(nombre_archivo, continentes=None):
+    """
+    Cargar los datos de paises desde un archivo CSV.
+
+    Valida la existencia del archivo y el formato numérico de
+    población y superficie. Con almacenamiento por continente se
+    pueden cargar sólo los "continentes" indicados.
+    """
+    lista_paises = []
+    for pais in leer_paises(nombre_archivo, continentes):
+        lista_paises.append(pais)
+    return lista_paises
+
+def iniciar_carga_en_segundo_plano(nombre_archivo, continentes=None):
+    """
+    Comienza a cargar los países en un hilo aparte y retorna de inmediato
+    la lista (vacía al principio) que el hilo va completando.
+
+    Así el menú se muestra enseguida, sin importar el tamaño del CSV.
+    Con almacenamiento por continente, "continentes" limita la sesión a
+    esos fragmentos (los demás se cargan sólo si se los pide).
+    """
+    lista_paises = []
+    estado_carga["terminada"].clear()
+    estado_carga["pendientes"] = []
+    estado_carga["error"] = None
+    indices["lista"] = None
+    similitud["lista"] = None
+    estado_fragmentos["cargados"] = set()
+    estado_fragmentos["modificados"] = set()
+    estado_bajas["en_memoria"] = 0
+    estado_bajas["en_registro"] = len(leer_bajas(nombre_archivo))
+    if es_particionado(nombre_archivo):
+        estado_fragmentos["directorio"] = nombre_archivo
+    else:
+        estado_fragmentos["directorio"] = None
+    hilo = threading.Thread(target=tarea_de_carga, args=(nombre_archivo, lista_paises, continentes), daemon=True)
+    estado_carga["hilo"] = hilo
+    hilo.start()
+    return lista_paises
+
+def tarea_de_carga(nombre_archivo, lista_paises, continentes=None):
+    """
+    Función que ejecuta el hilo de carga.
+
+    Agrega los países del archivo a la lista y, al terminar, incorpora
+    los países que el usuario dio de alta mientras tanto (descartando
+    los que ya existían en el archivo) y los guarda.
+    """
+    lectura_completa = False
+    try:
+        cargar_historial(nombre_archivo)
+        if estado_fragmentos["directorio"] is not None:
+            ## Se carga fragmento por fragmento, para que los filtros por
+            ## continente puedan usar los que ya están listos
+            manifiesto = leer_manifiesto(nombre_archivo)
+            for clave in claves_de_fragmentos(manifiesto, continentes):
+                cargar_fragmento(lista_paises, clave)
+        else:
+            for pais in leer_paises(nombre_archivo):
+                lista_paises.append(pais)
+        lectura_completa = True
+    except Exception as error:
+        ## No se relanza: el menú sigue con los países leídos, pero sin guardar
+        estado_carga["error"] = f"No se pudo leer completo '{nombre_archivo}' ({error})."
+        print(f"\nError: {estado_carga['error']} Los cambios de esta sesión no se guardarán.")
+    finally:
+        ## Mientras incorporamos los pendientes nadie puede agregar otros
+        with estado_carga["candado"]:
+            pendientes = estado_carga["pendientes"]
+            estado_carga["pendientes"] = []
+            if pendientes:
+                nombres = set()
+                for pais in lista_paises:
+                    nombres.add(pais['nombre'].strip().lower())
+                for pais in pendientes:
+                    nombre_normalizado = pais['nombre'].strip().lower()
+                    if nombre_normalizado in nombres:
+                        print(f"Error: El país '{pais['nombre']}' ya existía en el archivo. Se descarta el alta.")
+                        continue
+                    nombres.add(nombre_normalizado)
+                    lista_paises.append(pais)
+                    marcar_modificado(pais)
+                ## Si la lectura falló no guardamos, para no pisar el archivo con datos incompletos
+                if lectura_completa:
+                    guardar_paises(nombre_archivo, lista_paises)
+            ## Con la lista completa se arman los índices, antes de avisar que terminó
+            asegurar_indices(lista_paises)
+            nueva_generacion()
+            estado_carga["terminada"].set()
+
+    ## Ya con el menú disponible, dejamos listo el índice de posiciones
+    ## del archivo para las búsquedas directas de la próxima vez
+    if lectura_completa and admite_indice_offsets(nombre_archivo):
+        asegurar_indice_offsets(nombre_archivo)
+
+def comprobar_lectura_completa():
+    """
+    Lanza ValueError si la carga en segundo plano no pudo leer todo el
+    archivo: guardar la lista incompleta borraría los países no leídos.
+    """
+    if estado_carga["error"] is not None:
+        raise ValueError(f"{estado_carga['error']} No se guarda para no perder datos.")
+
+def esperar_carga():
+    """
+    Bloquea hasta que termine la carga en segundo plano (si hay una en curso).
+    La usan las operaciones que necesitan todos los países.
+    """
+    if not estado_carga["terminada"].is_set():
+        print("Esperando a que termine la carga de países...")
+        estado_carga["terminada"].wait()
+
+def registrar_alta(lista_paises, pais):
+    """
+    Agrega un país a la lista. Si la carga sigue en curso, lo deja en el
+    buffer de pendientes para incorporarlo al terminar.
+
+    Retorna True si el país quedó en la lista, False si quedó pendiente.
+    Lanza ValueError si ya existe un país con ese nombre (también en los
+    fragmentos que la sesión no cargó).
+    """
+    with sin_interrupciones(), estado_carga["candado"]:
+        if not estado_carga["terminada"].is_set():
+            estado_carga["pendientes"].append(pais)
+            return False
+        ## Se vuelve a controlar acá, con el candado tomado, para que nadie
+        ## agregue el mismo nombre entre la validación y el alta
+        if buscar_pais_por_nombre(lista_paises, pais['nombre']) or existe_en_fragmentos_sin_cargar(pais['nombre']):
+            raise ValueError(f"El país '{pais['nombre']}' ya existe en la lista.")
+        lista_paises.append(pais)
+        marcar_modificado(pais)
+        if indices["lista"] is lista_paises:
+            indexar_pais(pais)
+        agregar_a_similitud(lista_paises, pais)
+        nueva_generacion()
+        return True
+
+def registrar_cambio(lista_paises, pais, poblacion, superficie, continente=None, anio=None):
+    """
+    Cambia la población y la superficie (y opcionalmente el continente)
+    de un país de la lista, manteniendo actualizados los índices.
+
+    Los valores nuevos quedan en el historial del país para el "anio"
+    indicado (por defecto, el año actual). Si ese año es anterior al
+    último del historial (o, sin historial, al año actual) sólo se agrega
+    al historial: los datos vigentes del país no cambian.
+
+    Retorna True si cambiaron los datos vigentes del país.
+    """
+    anio_actual = datetime.date.today().year
+    if anio is None:
+        anio = anio_actual
+    with sin_interrupciones(), estado_carga["candado"]:
+        ultimos = [serie["ultimo_anio"] for serie in (obtener_serie(pais['nombre'], "poblacion"), obtener_serie(pais['nombre'], "superficie"))
+                   if serie is not None and serie["ultimo_anio"] is not None]
+        anio_vigente = max(ultimos) if ultimos else anio_actual
+        ## Sin historial, el valor actual se sabe vigente en el año actual
+        anio_anterior = anio_actual if anio != anio_actual else None
+        if anio < anio_vigente:
+            registrar_historial(pais['nombre'], "poblacion", anio, poblacion, pais["poblacion"], anio_anterior)
+            registrar_historial(pais['nombre'], "superficie", anio, superficie, pais["superficie"], anio_anterior)
+            return False
+
+        indexado = indices["lista"] is lista_paises
+        cambia_continente = continente is not None and continente.strip().lower() != pais['continente'].strip().lower()
+        poblacion_anterior = pais["poblacion"]
+        superficie_anterior = pais["superficie"]
+        if indexado and cambia_continente:
+            restar_de_resumen(indices["continentes"], pais)
+        marcar_modificado(pais)
+        pais["poblacion"] = poblacion
+        pais["superficie"] = superficie
+        if continente is not None:
+            pais["continente"] = continente
+            marcar_modificado(pais)
+        if indexado and cambia_continente:
+            sumar_a_resumen(indices["continentes"], pais)
+        elif indexado:
+            cambiar_en_resumen(indices["continentes"], pais, poblacion_anterior, superficie_anterior)
+        invalidar_derivadas(pais)
+        quitar_de_similitud(lista_paises, pais)
+        agregar_a_similitud(lista_paises, pais)
+        nueva_generacion()
+        registrar_historial(pais['nombre'], "poblacion", anio, poblacion, poblacion_anterior, anio_anterior)
+        registrar_historial(pais['nombre'], "superficie", anio, superficie, superficie_anterior, anio_anterior)
+        return True
+
+def guardar_paises(nombre_archivo, lista_paises):
+    """
+    Guarda la lista de países en un archivo CSV (comprimido si la
+    extensión es .gz, .bz2 o .xz).
+
+    Con almacenamiento por continente sólo se reescriben los fragmentos
+    de los continentes que cambiaron. Los países dados de baja no se
+    guardan, y sus bajas se quitan del registro de bajas.
+
+    Lanza ValueError si la carga del archivo quedó incompleta.
+    """
+    comprobar_lectura_completa()
+    if historial["modificado"]:
+        guardar_historial(nombre_archivo)
+    if es_particionado(nombre_archivo):
+        escritos = guardar_fragmentos(nombre_archivo, lista_paises)
+        if estado_bajas["en_registro"]:
+            depurar_registro_bajas(nombre_archivo, escritos)
+        return
+    with abrir_archivo(nombre_archivo, "w") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(["nombre", "poblacion", "superficie", "continente"])
+
+        for pais in paises_vigentes(lista_paises):
+            escritor.writerow([pais['nombre'], pais['poblacion'], pais['superficie'], pais['continente']])
+    if estado_bajas["en_registro"]:
+        depurar_registro_bajas(nombre_archivo)
+
+def programar_guardado(nombre_archivo, lista_paises):
+    """
+    Marca que la lista tiene cambios sin guardar y retorna de inmediato.
+    El hilo de guardado la guarda cuando dejan de llegar cambios.
+    """
+    ahora = time.monotonic()
+    if not estado_guardado["pendiente"].is_set():
+        estado_guardado["primer_cambio"] = ahora
+    estado_guardado["ultimo_cambio"] = ahora
+    estado_guardado["archivo"] = nombre_archivo
+    estado_guardado["lista"] = lista_paises
+    estado_guardado["pendiente"].set()
+    if estado_guardado["hilo"] is None:
+        hilo = threading.Thread(target=tarea_de_guardado, daemon=True)
+        estado_guardado["hilo"] = hilo
+        hilo.start()
+
+def tarea_de_guardado():
+    """
+    Función que ejecuta el hilo de guardado: espera a que haya cambios,
+    deja pasar un momento para juntar los siguientes y guarda una vez.
+    """
+    while True:
+        estado_guardado["pendiente"].wait()
+        while True:
+            limite = min(estado_guardado["ultimo_cambio"] + ESPERA_GUARDADO,
+                         estado_guardado["primer_cambio"] + ESPERA_MAXIMA)
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            time.sleep(restante)
+        ## Un error inesperado no puede terminar el hilo: nadie lo volvería a iniciar
+        try:
+            guardar_pendiente()
+        except Exception as error:
+            print(f"Error: Falló el guardado en segundo plano. {error}")
+
+def guardar_pendiente():
+    """
+    Guarda la lista si tiene cambios sin guardar. La usan el hilo de
+    guardado y vaciar_guardado; el candado evita que guarden a la vez.
+    """
+    with estado_guardado["candado"]:
+        if not estado_guardado["pendiente"].is_set():
+            return
+        ## Se limpia antes de guardar: un cambio durante el guardado vuelve a marcarla
+        estado_guardado["pendiente"].clear()
+        esperar_carga()
+        if estado_carga["error"] is not None:
+            ## Reintentar no sirve: la lista seguiría incompleta
+            print(f"Error: No se guardaron los cambios. {estado_carga['error']}")
+            return
+        try:
+            with estado_carga["candado"]:
+                guardar_paises(estado_guardado["archivo"], estado_guardado["lista"])
+        except Exception as error:
+            print(f"Error: No se pudieron guardar los cambios. {error}")
+            ## Quedan pendientes: se reintenta más tarde (y al salir)
+            reintento = time.monotonic() + ESPERA_MAXIMA
+            estado_guardado["primer_cambio"] = reintento
+            estado_guardado["ultimo_cambio"] = reintento
+            estado_guardado["pendiente"].set()
+            return
+        republicar(estado_guardado["lista"])
+
+def vaciar_guardado():
+    """
+    Guarda ya mismo los cambios pendientes (si hay). Se usa al salir.
+    Si mientras guarda llega SIGTERM, termina el programa al final.
+    """
+    with sin_interrupciones():
+        guardar_pendiente()
+
+@contextlib.contextmanager
+def sin_interrupciones():
+    """
+    Marca una operación del hilo principal que SIGTERM no debe cortar por
+    la mitad (un cambio en los datos o un guardado). Si la señal llega
+    durante la operación, el programa termina recién al final de la más
+    externa, con los datos completos para el guardado de atexit.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        ## Las señales sólo interrumpen al hilo principal
+        yield
+        return
+    estado_guardado["ocupado"] += 1
+    try:
+        yield
+    finally:
+        estado_guardado["ocupado"] -= 1
+        if estado_guardado["ocupado"] == 0 and estado_guardado["salir"]:
+            ## Se limpia para que el vaciar_guardado de atexit no vuelva a salir
+            estado_guardado["salir"] = False
+            sys.exit(0)
+
+def manejar_sigterm(numero_senal, marco):
+    """
+    Al recibir SIGTERM termina el programa; los cambios pendientes los
+    guarda vaciar_guardado, registrado con atexit.
+
+    El manejador no guarda por su cuenta: si la señal llega mientras el
+    hilo principal está dentro de vaciar_guardado, tomar el candado de
+    guardado acá lo bloquearía para siempre. Si llega en medio de un
+    cambio, guardar la lista a medio actualizar dejaría datos
+    inconsistentes. En esos casos sólo se anota que hay que salir, y la
+    operación en curso termina primero (ver sin_interrupciones).
+    """
+    if estado_guardado["ocupado"]:
+        estado_guardado["salir"] = True
+        return
+    sys.exit(0)
+
+def nueva_generacion():
+    """
+    Anota que los datos cambiaron. Los valores calculados a partir de
+    todos los países (por ejemplo, la participación en la población
+    mundial) guardan la generación con la que se calcularon.
+    """
+    indices["generacion"] += 1
+
+# ==========================================
+#             Funciones de Bajas
+# ==========================================
+
+## Dar de baja un país no reescribe el archivo: el país queda marcado en
+## memoria (clave "_baja") y su nombre y continente se agregan al registro
+## de bajas ("paises_bajas.csv" para "paises.csv"), que al leer el archivo
+## se usa para omitir esas filas. Cualquier guardado escribe sólo los
+## países vigentes y quita del registro las bajas ya guardadas (con
+## fragmentos, las de los fragmentos reescritos). Cuando las bajas superan
+## UMBRAL_BAJAS de los países se compactan la lista y el archivo.
+UMBRAL_BAJAS = 0.2
+
+def ruta_bajas(nombre_archivo):
+    """
+    Retorna el archivo donde se registran las bajas de un archivo de datos
+    (por ejemplo "paises_bajas.csv" para "paises.csv").
+    """
+    return ruta_asociada(nombre_archivo, "bajas")
+
+def leer_bajas(nombre_archivo):
+    """
+    Retorna el conjunto de (nombre, continente) normalizados dados de baja
+    en el archivo y todavía no compactados.
+    """
+    ruta = ruta_bajas(nombre_archivo)
+    if not os.path.isfile(ruta):
+        return set()
+    with open(ruta, mode="r", encoding="utf-8", newline="") as archivo:
+        return {(fila["nombre"], fila["continente"]) for fila in csv.DictReader(archivo) if fila.get("nombre")}
+
+def anotar_baja(nombre_archivo, pais):
+    """
+    Agrega un país al final del registro de bajas (sin reescribirlo).
+    """
+    ruta = ruta_bajas(nombre_archivo)
+    nuevo = not os.path.isfile(ruta)
+    with open(ruta, mode="a", encoding="utf-8", newline="") as archivo:
+        escritor = csv.writer(archivo)
+        if nuevo:
+            escritor.writerow(["nombre", "continente"])
+        escritor.writerow([pais['nombre'].strip().lower(), pais['continente'].strip().lower()])
+    estado_bajas["en_registro"] += 1
+
+def depurar_registro_bajas(nombre_archivo, continentes=None):
+    """
+    Quita del registro de bajas las de los continentes indicados (los
+    fragmentos que se acaban de reescribir), o todas si no se indican.
+    Si no queda ninguna, borra el registro.
+    """
+    ruta = ruta_bajas(nombre_archivo)
+    restantes = []
+    if continentes is not None:
+        restantes = sorted(baja for baja in leer_bajas(nombre_archivo) if baja[1] not in continentes)
+    if restantes:
+        temporal = ruta + ".tmp"
+        with open(temporal, mode="w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["nombre", "continente"])
+            escritor.writerows(restantes)
+        os.replace(temporal, ruta)
+    elif os.path.isfile(ruta):
+        os.remove(ruta)
+    estado_bajas["en_registro"] = len(restantes)
+
+def paises_vigentes(lista_paises):
+    """
+    Devuelve (con yield) los países de la lista que no fueron dados de baja.
+    """
+    for pais in lista_paises:
+        if not pais.get("_baja"):
+            yield pais
+
+def registrar_baja(nombre_archivo, lista_paises, pais):
+    """
+    Da de baja un país de la lista guardada en "nombre_archivo": lo anota
+    en el registro de bajas, lo marca, lo quita de los índices y descarta
+    su historial. Retorna True si además hay que compactar (ver
+    compactar_bajas).
+
+    Se anota con el candado tomado: si el hilo de guardado reescribiera el
+    archivo en el medio, depuraría el registro antes de que la baja esté.
+    """
+    with sin_interrupciones(), estado_carga["candado"]:
+        anotar_baja(nombre_archivo, pais)
+        pais["_baja"] = True
+        estado_bajas["en_memoria"] += 1
+        if indices["lista"] is lista_paises:
+            desindexar_pais(pais)
+        quitar_de_similitud(lista_paises, pais)
+        ## Su historial tampoco cuenta más en la evolución por año
+        if historial["series"].pop(pais['nombre'].strip().lower(), None) is not None:
+            historial["modificado"] = True
+        ## Con fragmentos, el del continente se reescribe en el próximo guardado
+        marcar_modificado(pais)
+        nueva_generacion()
+    vigentes = len(lista_paises) - estado_bajas["en_memoria"]
+    return max(estado_bajas["en_memoria"], estado_bajas["en_registro"]) > UMBRAL_BAJAS * max(vigentes, 1)
+
+def compactar_bajas(nombre_archivo, lista_paises):
+    """
+    Quita de la lista los países dados de baja (sin cambiar la lista de
+    lugar, así los índices siguen valiendo) y programa un guardado, que
+    reescribe el archivo sin ellos y borra el registro de bajas.
+    """
+    with sin_interrupciones(), estado_carga["candado"]:
+        lista_paises[:] = list(paises_vigentes(lista_paises))
+        estado_bajas["en_memoria"] = 0
+    programar_guardado(nombre_archivo, lista_paises)
+
+# ==========================================
+#          Funciones de Columnas Derivadas
+# ==========================================
+
+## Las columnas derivadas no están en el CSV: se calculan la primera vez
+## que se piden y quedan guardadas en el país (clave "_derivadas") hasta
+## que registrar_cambio modifica sus datos. Las que dependen de todos los
+## países se recalculan además cuando cambia la generación de los datos.
+
+def calcular_densidad(pais):
+    """
+    Habitantes por km². Un país sin superficie tiene densidad infinita
+    (o 0 si tampoco tiene población).
+    """
+    if pais['superficie'] == 0:
+        return float("inf") if pais['poblacion'] else 0.0
+    return pais['poblacion'] / pais['superficie']
+
+def poblacion_mundial():
+    """
+    Suma de la población de todos los países, tomada de los resúmenes
+    por continente de la lista con índices.
+    """
+    total = 0
+    for resumen in indices["continentes"].values():
+        total += resumen["poblacion_total"]
+    return total
+
+def calcular_participacion(pais):
+    """
+    Porcentaje de la población mundial que vive en el país.
+    """
+    total = poblacion_mundial()
+    if total == 0:
+        return 0.0
+    return pais['poblacion'] * 100 / total
+
+## nombre de la columna -> (función que la calcula, depende de todos los países)
+COLUMNAS_DERIVADAS = {
+    "densidad": (calcular_densidad, False),
+    "participacion": (calcular_participacion, True),
+}
+
+def obtener_derivada(pais, columna):
+    """
+    Retorna el valor de una columna derivada del país, calculándolo
+    sólo si no estaba guardado o si quedó desactualizado.
+    """
+    calcular, depende_de_todos = COLUMNAS_DERIVADAS[columna]
+    guardadas = pais.get("_derivadas")
+    if guardadas is None:
+        guardadas = {}
+        pais["_derivadas"] = guardadas
+    guardado = guardadas.get(columna)
+    if guardado is not None and (not depende_de_todos or guardado[1] == indices["generacion"]):
+        return guardado[0]
+    valor = calcular(pais)
+    guardadas[columna] = (valor, indices["generacion"])
+    return valor
+
+def invalidar_derivadas(pais):
+    """
+    Descarta las columnas derivadas guardadas del país (sus datos cambiaron).
+    """
+    pais.pop("_derivadas", None)
+
+def obtener_valor(pais, clave):
+    """
+    Retorna el valor de una columna del país, sea del CSV o derivada.
+    """
+    if clave in COLUMNAS_DERIVADAS:
+        return obtener_derivada(pais, clave)
+    return pais[clave]
+
+# ==========================================
+#     Funciones de Almacenamiento por Continente
+# ==========================================
+
+def es_particionado(nombre_archivo):
+    """
+    Retorna True si "nombre_archivo" es un directorio con almacenamiento
+    por continente (es decir, que contiene un manifiesto).
+    """
+    return os.path.isfile(os.path.join(nombre_archivo, MANIFIESTO))
+
+def leer_manifiesto(directorio):
+    """
+    Lee el manifiesto del directorio. Tiene la forma:
+    {"version": 1, "fragmentos": {clave: {"continente", "archivo", "cantidad"}}}
+    """
+    with open(os.path.join(directorio, MANIFIESTO), mode="r", encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+def escribir_manifiesto(directorio, manifiesto):
+    """
+    Escribe el manifiesto reemplazando el anterior de una sola vez.
+    """
+    ruta = os.path.join(directorio, MANIFIESTO)
+    with open(ruta + ".tmp", mode="w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=2)
+    os.replace(ruta + ".tmp", ruta)
+
+def claves_de_fragmentos(manifiesto, continentes=None):
+    """
+    Retorna las claves de los fragmentos a leer: todas, o sólo las de
+    los continentes indicados que existan en el manifiesto.
+    """
+    if continentes is None:
+        return list(manifiesto["fragmentos"])
+    claves = []
+    for continente in continentes:
+        clave = continente.strip().lower()
+        if clave in manifiesto["fragmentos"] and clave not in claves:
+            claves.append(clave)
+    return claves
+
+def nombre_fragmento(continente, usados):
+    """
+    Arma un nombre de archivo para el fragmento de un continente
+    (por ejemplo "america_del_sur.csv"), distinto de los ya "usados".
+    """
+    texto = unicodedata.normalize("NFKD", continente.strip().lower()).encode("ascii", "ignore").decode("ascii")
+    base = ""
+    for caracter in texto:
+        if caracter.isalnum():
+            base += caracter
+        elif not base.endswith("_"):
+            base += "_"
+    base = base.strip("_") or "continente"
+    archivo = base + ".csv"
+    numero = 2
+    while archivo in usados:
+        archivo = f"{base}_{numero}.csv"
+        numero += 1
+    usados.add(archivo)
+    return archivo
+
+def escribir_fragmento(directorio, archivo, paises):
+    """
+    Escribe el CSV de un fragmento reemplazando el anterior de una sola vez.
+    """
+    ruta = os.path.join(directorio, archivo)
+    exportar_csv(paises, ruta + ".tmp")
+    os.replace(ruta + ".tmp", ruta)
+
+def marcar_modificado(pais):
+    """
+    Anota que el fragmento del continente del país debe reescribirse.
+    """
+    estado_fragmentos["modificados"].add(pais['continente'].strip().lower())
+
+def cargar_fragmento(lista_paises, clave):
+    """
+    Agrega a la lista los países del fragmento de un continente, si la
+    sesión usa fragmentos y todavía no estaba cargado.
+
+    El archivo se lee sin bloquear a los demás; si mientras tanto otro
+    hilo cargó el mismo fragmento, lo leído se descarta.
+    """
+    directorio = estado_fragmentos["directorio"]
+    if directorio is None or clave in estado_fragmentos["cargados"]:
+        return
+    fragmento = leer_manifiesto(directorio)["fragmentos"].get(clave)
+    nuevos = []
+    if fragmento is not None:
+        bajas = {nombre for nombre, continente in leer_bajas(directorio) if continente == clave}
+        nuevos = list(leer_paises(os.path.join(directorio, fragmento["archivo"]), bajas=bajas))
+    with estado_carga["candado"]:
+        if clave in estado_fragmentos["cargados"]:
+            return
+        lista_paises.extend(nuevos)
+        estado_fragmentos["cargados"].add(clave)
+        if indices["lista"] is lista_paises:
+            for pais in nuevos:
+                indexar_pais(pais)
+        for pais in nuevos:
+            agregar_a_similitud(lista_paises, pais)
+        nueva_generacion()
+
+def asegurar_continente(lista_paises, continente):
+    """
+    Si la sesión usa fragmentos, carga (si hace falta) sólo el del
+    continente pedido y retorna True. Si no, retorna False.
+    """
+    if estado_fragmentos["directorio"] is None:
+        return False
+    cargar_fragmento(lista_paises, continente.strip().lower())
+    return True
+
+def cargar_fragmentos_restantes(lista_paises):
+    """
+    Si la sesión usa fragmentos, carga los que todavía no se cargaron.
+    Lo usan las herramientas que comparan o actualizan todos los países.
+    """
+    directorio = estado_fragmentos["directorio"]
+    if directorio is None:
+        return
+    for clave in leer_manifiesto(directorio)["fragmentos"]:
+        cargar_fragmento(lista_paises, clave)
+
+def existe_en_fragmentos_sin_cargar(nombre):
+    """
+    Retorna True si el país está en algún fragmento que la sesión no
+    cargó (los nombres son únicos entre todos los continentes).
+    """
+    directorio = estado_fragmentos["directorio"]
+    if directorio is None:
+        return False
+    nombre_normalizado = nombre.strip().lower()
+    bajas = leer_bajas(directorio)
+    for clave, fragmento in leer_manifiesto(directorio)["fragmentos"].items():
+        if clave in estado_fragmentos["cargados"] or (nombre_normalizado, clave) in bajas:
+            continue
+        if buscar_pais_en_archivo(os.path.join(directorio, fragmento["archivo"]), nombre) is not None:
+            return True
+    return False
+
+def guardar_fragmentos(directorio, lista_paises):
+    """
+    Reescribe sólo los fragmentos de los continentes modificados y
+    actualiza el manifiesto. Los continentes que quedaron sin países
+    pierden su fragmento.
+
+    Retorna el conjunto de continentes (normalizados) reescritos.
+    """
+    comprobar_lectura_completa()
+    escritos = set()
+    with estado_carga["candado"]:
+        modificados = estado_fragmentos["modificados"]
+        estado_fragmentos["modificados"] = set()
+        if not modificados:
+            return escritos
+        manifiesto = leer_manifiesto(directorio)
+        usados = set()
+        for fragmento in manifiesto["fragmentos"].values():
+            usados.add(fragmento["archivo"])
+        asegurar_indices(lista_paises)
+
+        for clave in modificados:
+            fragmento = manifiesto["fragmentos"].get(clave)
+            ## Nunca pisamos un fragmento que la sesión no cargó
+            if (fragmento is not None and estado_fragmentos["directorio"] == directorio
+                    and clave not in estado_fragmentos["cargados"]):
+                print(f"Error: El fragmento de '{fragmento['continente']}' no está cargado. No se guarda.")
+                continue
+            resumen = indices["continentes"].get(clave)
+            if resumen is None:
+                if fragmento is not None:
+                    ruta = os.path.join(directorio, fragmento["archivo"])
+                    if os.path.isfile(ruta):
+                        os.remove(ruta)
+                    del manifiesto["fragmentos"][clave]
+                escritos.add(clave)
+                continue
+            if fragmento is None:
+                fragmento = {
+                    "continente": resumen["continente"],
+                    "archivo": nombre_fragmento(resumen["continente"], usados),
+                    "cantidad": 0
+                }
+                manifiesto["fragmentos"][clave] = fragmento
+            escribir_fragmento(directorio, fragmento["archivo"], resumen["paises"])
+            fragmento["cantidad"] = len(resumen["paises"])
+            escritos.add(clave)
+        escribir_manifiesto(directorio, manifiesto)
+    return escritos
+
+def particionar_paises(lista_paises, directorio):
+    """
+    Crea el almacenamiento por continente en "directorio": un CSV por
+    continente y el manifiesto que los describe.
+
+    Lanza ValueError si "directorio" es el de la sesión (se pisaría el
+    manifiesto que se está usando) o si la carga quedó incompleta.
+    """
+    comprobar_lectura_completa()
+    actual = estado_fragmentos["directorio"]
+    if actual is not None and os.path.realpath(directorio) == os.path.realpath(actual):
+        raise ValueError(f"'{directorio}' es el directorio que se está usando.")
+    esperar_carga()
+    ## Con una sesión limitada a algunos continentes hacen falta también los demás
+    cargar_fragmentos_restantes(lista_paises)
+    os.makedirs(directorio, exist_ok=True)
+    asegurar_indices(lista_paises)
+    manifiesto = {"version": 1, "fragmentos": {}}
+    usados = set()
+    for clave, resumen in indices["continentes"].items():
+        archivo = nombre_fragmento(resumen["continente"], usados)
+        escribir_fragmento(directorio, archivo, resumen["paises"])
+        manifiesto["fragmentos"][clave] = {
+            "continente": resumen["continente"],
+            "archivo": archivo,
+            "cantidad": len(resumen["paises"])
+        }
+    escribir_manifiesto(directorio, manifiesto)
+    ## El historial acompaña a los datos en el nuevo directorio
+    if historial["series"]:
+        guardar_historial(directorio)
+    return len(manifiesto["fragmentos"])
+
+
+# ==========================================
+#     Funciones de Acceso Directo al Archivo
+# ==========================================
+
+## Índice de posiciones: archivo "<datos>.idx" con la posición (en bytes)
+## de la fila de cada país dentro del CSV, para leer una sola fila sin
+## cargar el archivo. Formato (little-endian):
+##   cabecera: "PAISIDX1", tamaño del CSV (uint64), fecha de modificación
+##             del CSV en ns (int64) y cantidad de entradas (uint32)
+##   entradas: (inicio del nombre, largo del nombre, posición de la fila),
+##             como (uint32, uint32, uint64), ordenadas por nombre
+##   nombres:  los nombres normalizados en UTF-8, uno tras otro
+## Se lee con mmap y búsqueda binaria, sin leer el índice completo.
+MAGIA_INDICE = b"PAISIDX1"
+FORMATO_CABECERA_INDICE = "<8sQqI"
+FORMATO_ENTRADA_INDICE = "<IIQ"
+
+def ruta_indice_offsets(nombre_archivo):
+    """
+    Retorna el archivo del índice de posiciones de un CSV.
+    """
+    return nombre_archivo + ".idx"
+
+def admite_indice_offsets(nombre_archivo):
+    """
+    El índice de posiciones sólo sirve para un CSV sin comprimir.
+    """
+    return (os.path.isfile(nombre_archivo)
+            and os.path.splitext(nombre_archivo)[1].lower() not in COMPRESORES)
+
+def firma_archivo(nombre_archivo):
+    """
+    Retorna (tamaño, fecha de modificación en ns) del archivo, para
+    saber si cambió desde que se armó el índice.
+    """
+    datos = os.stat(nombre_archivo)
+    return datos.st_size, datos.st_mtime_ns
+
+def indice_offsets_vigente(nombre_archivo):
+    """
+    Retorna True si el índice de posiciones existe y corresponde a la
+    versión actual del CSV.
+    """
+    ruta = ruta_indice_offsets(nombre_archivo)
+    if not admite_indice_offsets(nombre_archivo) or not os.path.isfile(ruta):
+        return False
+    with open(ruta, mode="rb") as archivo:
+        cabecera = archivo.read(struct.calcsize(FORMATO_CABECERA_INDICE))
+    if len(cabecera) < struct.calcsize(FORMATO_CABECERA_INDICE):
+        return False
+    magia, tamanio, modificacion, _ = struct.unpack(FORMATO_CABECERA_INDICE, cabecera)
+    return magia == MAGIA_INDICE and (tamanio, modificacion) == firma_archivo(nombre_archivo)
+
+def construir_indice_offsets(nombre_archivo):
+    """
+    Recorre el CSV una vez y escribe el índice de posiciones.
+
+    El CSV se lee en binario para conocer la posición exacta de cada
+    fila; como csv.reader pide las líneas de a una, la fila empieza en
+    la primera línea pedida desde la fila anterior (así también funcionan
+    los campos entre comillas con saltos de línea). Como en leer_paises,
+    las filas inválidas se omiten y si un nombre se repite vale la
+    primera fila válida.
+    """
+    firma = firma_archivo(nombre_archivo)
+    posiciones = {}
+    inicios = []
+
+    with open(nombre_archivo, mode="rb") as archivo:
+        def lineas():
+            posicion = 0
+            for linea in archivo:
+                inicios.append(posicion)
+                posicion += len(linea)
+                yield linea.decode("utf-8")
+
+        lector_csv = csv.reader(lineas())
+        encabezado = next(lector_csv, None)
+        if encabezado and "nombre" in encabezado:
+            columna = encabezado.index("nombre")
+            inicios.clear()
+            for fila in lector_csv:
+                inicio = inicios[0]
+                inicios.clear()
+                if columna < len(fila) and fila[columna] and error_de_fila(dict(zip(encabezado, fila))) is None:
+                    posiciones.setdefault(fila[columna].strip().lower().encode("utf-8"), inicio)
+
+    ## Armamos tabla de entradas y bloque de nombres, ordenados por nombre
+    entradas = bytearray()
+    nombres = bytearray()
+    for nombre in sorted(posiciones):
+        entradas += struct.pack(FORMATO_ENTRADA_INDICE, len(nombres), len(nombre), posiciones[nombre])
+        nombres += nombre
+    ruta = ruta_indice_offsets(nombre_archivo)
+    with open(ruta + ".tmp", mode="wb") as archivo:
+        archivo.write(struct.pack(FORMATO_CABECERA_INDICE, MAGIA_INDICE, firma[0], firma[1], len(posiciones)))
+        archivo.write(entradas)
+        archivo.write(nombres)
+    os.replace(ruta + ".tmp", ruta)
+
+def asegurar_indice_offsets(nombre_archivo):
+    """
+    Reconstruye el índice de posiciones sólo si el CSV cambió.
+    """
+    if not indice_offsets_vigente(nombre_archivo):
+        construir_indice_offsets(nombre_archivo)
+
+def buscar_offset(nombre_archivo, nombre_buscado):
+    """
+    Busca en el índice (con mmap y búsqueda binaria) la posición de la
+    fila de un país. Retorna la posición en bytes o None.
+    """
+    objetivo = nombre_buscado.strip().lower().encode("utf-8")
+    tamanio_cabecera = struct.calcsize(FORMATO_CABECERA_INDICE)
+    tamanio_entrada = struct.calcsize(FORMATO_ENTRADA_INDICE)
+    with open(ruta_indice_offsets(nombre_archivo), mode="rb") as archivo:
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            cantidad = struct.unpack_from(FORMATO_CABECERA_INDICE, mapa, 0)[3]
+            inicio_nombres = tamanio_cabecera + cantidad * tamanio_entrada
+            bajo, alto = 0, cantidad
+            while bajo < alto:
+                medio = (bajo + alto) // 2
+                inicio, largo, posicion = struct.unpack_from(FORMATO_ENTRADA_INDICE, mapa, tamanio_cabecera + medio * tamanio_entrada)
+                nombre = mapa[inicio_nombres + inicio:inicio_nombres + inicio + largo]
+                if nombre == objetivo:
+                    return posicion
+                if nombre < objetivo:
+                    bajo = medio + 1
+                else:
+                    alto = medio
+    return None
+
+def buscar_pais_en_archivo(nombre_archivo, nombre_buscado):
+    """
+    Busca un país directamente en el archivo, sin cargarlo.
+
+    En un CSV sin comprimir usa el índice de posiciones (armándolo si el
+    CSV cambió) y lee sólo la fila del país. En otros casos recorre el
+    archivo hasta encontrarlo. Retorna el diccionario del país o None
+    (también si el país fue dado de baja).
+    """
+    if not admite_indice_offsets(nombre_archivo):
+        nombre_normalizado = nombre_buscado.strip().lower()
+        for pais in leer_paises(nombre_archivo):
+            if pais['nombre'].strip().lower() == nombre_normalizado:
+                return pais
+        return None
+
+    nombre_normalizado = nombre_buscado.strip().lower()
+    for nombre, _ in leer_bajas(nombre_archivo):
+        if nombre == nombre_normalizado:
+            return None
+    asegurar_indice_offsets(nombre_archivo)
+    posicion = buscar_offset(nombre_archivo, nombre_buscado)
+    if posicion is None:
+        return None
+    with open(nombre_archivo, mode="rb") as archivo:
+        encabezado = next(csv.reader([archivo.readline().decode("utf-8")]))
+        archivo.seek(posicion)
+        texto = io.TextIOWrapper(archivo, encoding="utf-8", newline="")
+        fila = next(csv.reader(texto), None)
+        texto.detach()
+    if fila is None:
+        return None
+    return fila_a_pais(dict(zip(encabezado, fila)))
+
+
+# ==========================================
+#          Funciones de Exportación
+# ==========================================
+
+## Formato binario columnar: cabecera "PAISCOL1" y luego bloques de hasta
+## FILAS_POR_BLOQUE filas. Cada bloque guarda la cantidad de filas y cada
+## columna por separado (enteros de 64 bits little-endian para los números,
+## textos con tabla de offsets y continentes codificados con un diccionario).
+## Un bloque con 0 filas marca el final del archivo.
+MAGIA_BINARIO = b"PAISCOL1"
+FILAS_POR_BLOQUE = 4096
+
+def exportar_paises(paises, nombre_salida, formato=None):
+    """
+    Escribe los países recibidos en un archivo, fila por fila.
+
+    "paises" puede ser cualquier iterable (una lista o un generador de
+    consulta); se recorre una sola vez y sin armar listas intermedias.
+    "formato" es "csv", "jsonl" o "bin"; si no se indica se deduce de la
+    extensión del archivo. Si además termina en .gz, .bz2 o .xz se escribe
+    comprimido. Retorna la cantidad de países exportados.
+    """
+    if formato is None:
+        formato = extension_sin_compresion(nombre_salida)
+    match formato:
+        case "csv":
+            return exportar_csv(paises, nombre_salida)
+        case "jsonl":
+            return exportar_jsonl(paises, nombre_salida)
+        case "bin":
+            return exportar_binario(paises, nombre_salida)
+        case _:
+            raise ValueError(f"Formato de exportación no soportado: '{formato}'")
+
+def exportar_csv(paises, nombre_salida):
+    """
+    Exporta los países en CSV, con las mismas columnas que paises.csv.
+    """
+    cantidad = 0
+    with abrir_archivo(nombre_salida, "w") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(["nombre", "poblacion", "superficie", "continente"])
+        for pais in paises:
+            escritor.writerow([pais['nombre'], pais['poblacion'], pais['superficie'], pais['continente']])
+            cantidad += 1
+    return cantidad
+
+def exportar_jsonl(paises, nombre_salida):
+    """
+    Exporta los países en JSON Lines (un objeto JSON por línea).
+    """
+    cantidad = 0
+    with abrir_archivo(nombre_salida, "w") as archivo:
+        for pais in paises:
+            fila = {
+                "nombre": pais['nombre'],
+                "poblacion": pais['poblacion'],
+                "superficie": pais['superficie'],
+                "continente": pais['continente']
+            }
+            archivo.write(json.dumps(fila, ensure_ascii=False) + "\n")
+            cantidad += 1
+    return cantidad
+
+def exportar_binario(paises, nombre_salida):
+    """
+    Exporta los países en el formato binario columnar.
+
+    Sólo se mantiene en memoria un bloque de filas a la vez.
+    """
+    cantidad = 0
+    with abrir_archivo(nombre_salida, "wb") as archivo:
+        archivo.write(MAGIA_BINARIO)
+        bloque = []
+        for pais in paises:
+            bloque.append(pais)
+            cantidad += 1
+            if len(bloque) == FILAS_POR_BLOQUE:
+                archivo.write(codificar_bloque(bloque))
+                bloque = []
+        if bloque:
+            archivo.write(codificar_bloque(bloque))
+        archivo.write(struct.pack("<I", 0))
+    return cantidad
+
+def codificar_textos(textos):
+    """
+    Codifica una lista de textos como tabla de offsets (uint32) + bytes UTF-8.
+    """
+    offsets = array.array("I")
+    datos = bytearray()
+    for texto in textos:
+        datos += texto.encode("utf-8")
+        offsets.append(len(datos))
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return offsets.tobytes() + struct.pack("<I", len(datos)) + bytes(datos)
+
+def decodificar_textos(buffer, posicion, cantidad):
+    """
+    Lee "cantidad" textos codificados con codificar_textos a partir de "posicion".
+
+    Retorna (lista_de_textos, nueva_posicion).
+    """
+    offsets = array.array("I")
+    offsets.frombytes(buffer[posicion:posicion + 4 * cantidad])
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    posicion += 4 * cantidad
+    (largo,) = struct.unpack_from("<I", buffer, posicion)
+    posicion += 4
+    datos = buffer[posicion:posicion + largo]
+    textos = []
+    inicio = 0
+    for fin in offsets:
+        textos.append(datos[inicio:fin].decode("utf-8"))
+        inicio = fin
+    return textos, posicion + largo
+
+def codificar_bloque(bloque):
+    """
+    Convierte un bloque de países (lista de diccionarios) en bytes columnares.
+    """
+    poblaciones = array.array("q", [pais['poblacion'] for pais in bloque])
+    superficies = array.array("q", [pais['superficie'] for pais in bloque])
+    if sys.byteorder == "big":
+        poblaciones.byteswap()
+        superficies.byteswap()
+
+    ## Diccionario de continentes del bloque y el código de cada fila
+    continentes = []
+    posiciones = {}
+    codigos = array.array("H")
+    for pais in bloque:
+        continente = pais['continente']
+        if continente not in posiciones:
+            posiciones[continente] = len(continentes)
+            continentes.append(continente)
+        codigos.append(posiciones[continente])
+    if sys.byteorder == "big":
+        codigos.byteswap()
+
+    return (struct.pack("<I", len(bloque))
+            + poblaciones.tobytes()
+            + superficies.tobytes()
+            + codificar_textos([pais['nombre'] for pais in bloque])
+            + struct.pack("<H", len(continentes))
+            + codificar_textos(continentes)
+            + codigos.tobytes())
+
+def leer_paises_binario(nombre_entrada):
+    """
+    Lee un archivo exportado en formato binario columnar y devuelve
+    (con yield) cada país como diccionario, bloque por bloque.
+    """
+    with abrir_archivo(nombre_entrada, "rb") as archivo:
+        if archivo.read(len(MAGIA_BINARIO)) != MAGIA_BINARIO:
+            raise ValueError(f"El archivo '{nombre_entrada}' no tiene formato binario de países.")
+        while True:
+            (cantidad,) = struct.unpack("<I", archivo.read(4))
+            if cantidad == 0:
+                return
+            ## Leemos el bloque completo y lo decodificamos columna por columna
+            poblaciones = array.array("q")
+            poblaciones.frombytes(archivo.read(8 * cantidad))
+            superficies = array.array("q")
+            superficies.frombytes(archivo.read(8 * cantidad))
+            if sys.byteorder == "big":
+                poblaciones.byteswap()
+                superficies.byteswap()
+            nombres = leer_textos_binario(archivo, cantidad)
+            (cantidad_continentes,) = struct.unpack("<H", archivo.read(2))
+            continentes = leer_textos_binario(archivo, cantidad_continentes)
+            codigos = array.array("H")
+            codigos.frombytes(archivo.read(2 * cantidad))
+            if sys.byteorder == "big":
+                codigos.byteswap()
+            for i in range(cantidad):
+                yield {
+                    "nombre": nombres[i],
+                    "poblacion": poblaciones[i],
+                    "superficie": superficies[i],
+                    "continente": continentes[codigos[i]]
+                }
+
+def leer_textos_binario(archivo, cantidad):
+    """
+    Lee desde un archivo abierto una columna de textos escrita con codificar_textos.
+    """
+    tabla = archivo.read(4 * cantidad + 4)
+    (largo,) = struct.unpack_from("<I", tabla, 4 * cantidad)
+    textos, _ = decodificar_textos(tabla + archivo.read(largo), 0, cantidad)
+    return textos
+
+def ofrecer_exportacion(resultados):
+    """
+    Pregunta al usuario si quiere exportar los resultados mostrados.
+    El formato se elige por la extensión del archivo (.csv, .jsonl o .bin).
+    """
+    if not resultados:
+        return
+    nombre_salida = input("Archivo para exportar los resultados (.csv, .jsonl, .bin; opcional .gz/.bz2/.xz) o Enter para omitir: ").strip()
+    if not nombre_salida:
+        return
+    try:
+        cantidad = exportar_paises(resultados, nombre_salida)
+    except (ValueError, OSError) as error:
+        print(f"Error: No se pudo exportar. {error}")
+        return
+    print(f"Se exportaron {cantidad} país(es) a '{nombre_salida}'.")
+
+# ==========================================
+#             Funciones de Validación
+# ==========================================
+
+def validar_existencia_pais(lista_paises, nombre):
+    """
+    Valida si un país ya existe en la lista de países.
+
+    Retorna True si el país existe, False en caso contrario.
+    """
+    return buscar_pais_por_nombre(lista_paises, nombre) is not None
+
+def buscar_pais_por_nombre(lista_paises, nombre_buscado):
+    """
+    Busca un país en la lista por su nombre.
+
+    Si la lista tiene índices se usa el índice de nombres (O(1));
+    si no, se recorre la lista. Para buscar en un archivo sin cargarlo
+    está buscar_pais_en_archivo.
+
+    Retorna el diccionario del país si se encuentra, None en caso contrario.
+    """
+    nombre_normalizado = nombre_buscado.strip().lower()
+    if indices["lista"] is lista_paises:
+        return indices["nombres"].get(nombre_normalizado)
+    for pais in paises_vigentes(lista_paises):
+        if pais['nombre'].strip().lower() == nombre_normalizado:
+            return pais
+    return None
+
+def validar_cantidad(cantidad):
+    ## Valida si la cantidad ingresada es un número entero positivo.
+    if cantidad.isdigit() and int(cantidad) >= 0:
+        return True
+    else:
+        print("La cantidad debe ser un número entero positivo.")
+        return False
+
+def validar_anio(anio):
+    ## Valida que el año ingresado sea un año razonable (entre 1 y 100 años
+    ## después del actual): el historial guarda los años en enteros de 32 bits.
+    anio_maximo = datetime.date.today().year + 100
+    if anio.isdigit() and 1 <= int(anio) <= anio_maximo:
+        return True
+    else:
+        print(f"El año debe ser un número entre 1 y {anio_maximo}.")
+        return False
+
+def mostrar_lista_paises(lista_paises, columna_extra=None):
+    """
+    Muestra una lista de países (diccionarios) en un formato de tabla legible en consola.
+    Si se indica "columna_extra" (una columna derivada, ej: densidad) se agrega a la tabla.
+    """
+    if not lista_paises:
+        print("No hay países para mostrar.")
+        return
+    ancho = 70 if columna_extra is None else 88
+    encabezado = f"{'Nombre':<20} | {'Población':<15} | {'Superficie (km²)':>15} | {'Continente':>15}"
+    if columna_extra is not None:
+        encabezado += f" | {columna_extra.title():>15}"
+    print("\n" + "=" * ancho)
+    print(encabezado)
+    print("=" * ancho)
+
+    ## Datos de cada país
+    for pais in lista_paises:
+        ## se formatean los números con separadores de miles
+        pob_formateada = f"{pais['poblacion']:,}"
+        sup_formateada = f"{pais['superficie']:,}"
+        linea = f"{pais['nombre']:<20} | {pob_formateada:<15} | {sup_formateada:>15} | {pais['continente']:>15}"
+        if columna_extra is not None:
+            valor_formateado = f"{obtener_derivada(pais, columna_extra):,.2f}"
+            linea += f" | {valor_formateado:>15}"
+        print(linea)
+    print("=" * ancho)
+
+def obtener_rango_numerico(tipo_dato):
+    """
+    Pide al usuario un rango numérico (mínimo y máximo) y lo valida usando la funcion "validar_cantidad".
+    "tipo_dato" es un string (ej: poblacion) para mostrar en los mensajes.
+    Retorna (min_val, max_val) como enteros.
+    """
+    ## Pedir y validar el valor minimo
+    while True:
+        min_str = input(f"Ingrese la {tipo_dato} MÍNIMA: ").strip()
+        if validar_cantidad(min_str):
+            break
+    ## Pedir y validar el valor maximo
+    while True:
+        max_str = input(f"Ingrese la {tipo_dato} MAXIMA: ").strip()
+        if validar_cantidad(max_str):
+            break
+    min_val = int(min_str)
+    max_val = int(max_str)
+
+    ## verificar que el minimo no sea mayor que el máximo
+    if min_val > max_val:
+        print(f"Error: El valor mínimo ({min_val}) no puede ser mayor que el valor máximo ({max_val}). Intercambiando valores.")
+        min_val, max_val = max_val, min_val
+    return min_val, max_val
+
+def obtener_nombre(pais):
+    """
+    Función auxiliar para obtener el nombre de un país.
+    Usada para ordenar por nombre.
+    """
+    return pais['nombre'].lower()
+
+def obtener_poblacion(pais):
+    """
+    Función auxiliar para obtener la población de un país.
+    Usada para ordenar por población.
+    """
+    return pais['poblacion']
+
+def obtener_superficie(pais):
+    """
+    Función auxiliar para obtener la superficie de un país.
+    Usada para ordenar por superficie.
+    """
+    return pais['superficie']
+
+def obtener_densidad(pais):
+    """
+    Función auxiliar para obtener la densidad de un país (columna derivada).
+    Usada para ordenar por densidad.
+    """
+    return obtener_derivada(pais, "densidad")
+
+
+# ==========================================
+#             Funciones de Consulta
+# ==========================================
+
+## Estas funciones devuelven los resultados con yield, para poder
+## mostrarlos o exportarlos sin armar listas intermedias.
+
+def iterar_coincidencias_parciales(lista_paises, texto):
+    """
+    Devuelve los países cuyo nombre contiene el texto (sin distinguir mayúsculas).
+    """
+    texto_lower = texto.strip().lower()
+    for pais in paises_vigentes(lista_paises):
+        if texto_lower in pais["nombre"].lower():
+            yield pais
+
+def iterar_por_continente(lista_paises, continente):
+    """
+    Devuelve los países del continente indicado (sin distinguir mayúsculas).
+    """
+    continente_normalizado = continente.strip().lower()
+    for pais in paises_vigentes(lista_paises):
+        if pais['continente'].strip().lower() == continente_normalizado:
+            yield pais
+
+def iterar_por_rango(lista_paises, clave, min_val, max_val):
+    """
+    Devuelve los países cuyo valor de "clave" está entre min_val y max_val (inclusive).
+    "clave" puede ser una columna del CSV o una columna derivada.
+    """
+    for pais in paises_vigentes(lista_paises):
+        if min_val <= obtener_valor(pais, clave) <= max_val:
+            yield pais
+
+
+# ==========================================
+#        Funciones de Caché de Consultas
+# ==========================================
+
+def consultar_con_cache(lista_paises, clave, funcion, *argumentos):
+    """
+    Retorna la lista de países que produce funcion(lista_paises, *argumentos),
+    reutilizando el resultado si la misma consulta ("clave", con los
+    parámetros ya normalizados) se hizo antes sobre los mismos datos.
+    Sólo se usa la caché con la lista de la sesión y la carga terminada,
+    porque mientras carga la lista crece sin cambiar de generación.
+    """
+    if indices["lista"] is not lista_paises or not estado_carga["terminada"].is_set():
+        return list(funcion(lista_paises, *argumentos))
+    entradas = cache_consultas["entradas"]
+    if cache_consultas["generacion"] != indices["generacion"]:
+        entradas.clear()
+        cache_consultas["generacion"] = indices["generacion"]
+    resultado = entradas.get(clave)
+    if resultado is not None:
+        entradas.move_to_end(clave)
+        cache_consultas["aciertos"] += 1
+        return list(resultado)
+    cache_consultas["fallos"] += 1
+    resultado = tuple(funcion(lista_paises, *argumentos))
+    entradas[clave] = resultado
+    if len(entradas) > CAPACIDAD_CACHE:
+        entradas.popitem(last=False)
+    return list(resultado)
+
+def buscar_coincidencias_parciales(lista_paises, texto):
+    """
+    Lista de países cuyo nombre contiene el texto (usa la caché).
+    """
+    clave = ("parcial", texto.strip().lower())
+    return consultar_con_cache(lista_paises, clave, iterar_coincidencias_parciales, texto)
+
+def buscar_por_continente(lista_paises, continente):
+    """
+    Lista de países del continente indicado (usa la caché).
+    """
+    clave = ("continente", continente.strip().lower())
+    return consultar_con_cache(lista_paises, clave, iterar_por_continente, continente)
+
+def buscar_por_rango(lista_paises, clave_valor, min_val, max_val):
+    """
+    Lista de países con "clave_valor" entre min_val y max_val (usa la caché).
+    """
+    clave = ("rango", clave_valor, min_val, max_val)
+    return consultar_con_cache(lista_paises, clave, iterar_por_rango, clave_valor, min_val, max_val)
+
+def mostrar_uso_cache():
+    """
+    Muestra cuántas consultas se respondieron desde la caché, para
+    ajustar CAPACIDAD_CACHE.
+    """
+    aciertos = cache_consultas["aciertos"]
+    fallos = cache_consultas["fallos"]
+    total = aciertos + fallos
+    print("\n--- Caché de Consultas ---")
+    print(f"Consultas guardadas: {len(cache_consultas['entradas'])} de {CAPACIDAD_CACHE}")
+    print(f"Aciertos: {aciertos:,} | Fallos: {fallos:,}")
+    if total:
+        print(f"Tasa de aciertos: {aciertos * 100 / total:.1f}%")
+
+
+# ==========================================
+#        Funciones de Índices y Resúmenes
+# ==========================================
+
+def asegurar_indices(lista_paises):
+    """
+    Construye los índices de la lista si todavía no existen
+    (o si fueron construidos para otra lista).
+    """
+    with estado_carga["candado"]:
+        if indices["lista"] is not lista_paises:
+            reconstruir_indices(lista_paises)
+
+def reconstruir_indices(lista_paises):
+    """
+    Recorre todos los países una vez y arma los índices desde cero.
+    """
+    indices["continentes"] = {}
+    indices["nombres"] = {}
+    for pais in paises_vigentes(lista_paises):
+        indexar_pais(pais, insertar_ordenado=False)
+    ## Ordenar una vez al final es más rápido que insertar uno por uno
+    indices["nombres_ordenados"] = sorted(indices["nombres"])
+    indices["lista"] = lista_paises
+    nueva_generacion()
+
+def desindexar_pais(pais):
+    """
+    Quita un país de todos los índices.
+    """
+    restar_de_resumen(indices["continentes"], pais)
+    nombre_normalizado = pais['nombre'].strip().lower()
+    if indices["nombres"].get(nombre_normalizado) is pais:
+        del indices["nombres"][nombre_normalizado]
+        ordenados = indices["nombres_ordenados"]
+        posicion = bisect.bisect_left(ordenados, nombre_normalizado)
+        if posicion < len(ordenados) and ordenados[posicion] == nombre_normalizado:
+            del ordenados[posicion]
+
+def indexar_pais(pais, insertar_ordenado=True):
+    """
+    Agrega un país a todos los índices.
+    """
+    sumar_a_resumen(indices["continentes"], pais)
+    nombre_normalizado = pais['nombre'].strip().lower()
+    indices["nombres"][nombre_normalizado] = pais
+    if insertar_ordenado:
+        bisect.insort(indices["nombres_ordenados"], nombre_normalizado)
+
+def completar_nombre(prefijo, limite=None):
+    """
+    Retorna los nombres de país (como están escritos) que empiezan con
+    "prefijo", sin distinguir mayúsculas, en orden alfabético.
+
+    Usa búsqueda binaria sobre los nombres ordenados: el costo depende
+    del largo del prefijo y de la cantidad de resultados, no del total.
+    """
+    prefijo_normalizado = prefijo.lstrip().lower()
+    ordenados = indices["nombres_ordenados"]
+    resultados = []
+    posicion = bisect.bisect_left(ordenados, prefijo_normalizado)
+    while posicion < len(ordenados) and ordenados[posicion].startswith(prefijo_normalizado):
+        if limite is not None and len(resultados) >= limite:
+            break
+        resultados.append(indices["nombres"][ordenados[posicion]]['nombre'])
+        posicion += 1
+    return resultados
+
+def crear_completador():
+    """
+    Crea la función que readline llama al presionar Tab: la primera vez
+    (estado 0) busca las sugerencias y luego las devuelve de a una.
+    """
+    sugerencias = []
+    def completador(texto, estado):
+        if estado == 0:
+            sugerencias[:] = completar_nombre(texto, LIMITE_SUGERENCIAS)
+        if estado < len(sugerencias):
+            return sugerencias[estado]
+        return None
+    return completador
+
+def pedir_nombre_pais(mensaje, lista_paises):
+    """
+    Pide un nombre de país con input(), autocompletando con Tab los
+    nombres de la lista cuando readline está disponible y la lista ya
+    tiene índices (si la carga sigue en curso se pide sin autocompletar).
+    """
+    if readline is None or indices["lista"] is not lista_paises:
+        return input(mensaje)
+    completador_anterior = readline.get_completer()
+    separadores_anteriores = readline.get_completer_delims()
+    ## Sin separadores: los nombres con espacios se completan enteros
+    readline.set_completer(crear_completador())
+    readline.set_completer_delims("")
+    if readline.__doc__ and "libedit" in readline.__doc__:
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+    try:
+        return input(mensaje)
+    finally:
+        readline.set_completer(completador_anterior)
+        readline.set_completer_delims(separadores_anteriores)
+
+def sumar_a_resumen(continentes, pais):
+    """
+    Suma un país al resumen de su continente (creándolo si hace falta).
+    "continentes" es el diccionario de resúmenes, con el nombre del
+    continente normalizado como clave.
+    """
+    clave = pais['continente'].strip().lower()
+    resumen = continentes.get(clave)
+    if resumen is None:
+        resumen = {
+            "continente": pais['continente'].strip(),
+            "paises": [],
+            "poblacion_total": 0,
+            "superficie_total": 0,
+            "mayor": None,
+            "menor": None,
+        }
+        continentes[clave] = resumen
+    resumen["paises"].append(pais)
+    resumen["poblacion_total"] += pais['poblacion']
+    resumen["superficie_total"] += pais['superficie']
+    if resumen["mayor"] is None or pais['poblacion'] > resumen["mayor"]['poblacion']:
+        resumen["mayor"] = pais
+    if resumen["menor"] is None or pais['poblacion'] < resumen["menor"]['poblacion']:
+        resumen["menor"] = pais
+
+def restar_de_resumen(continentes, pais):
+    """
+    Quita un país del resumen de su continente.
+
+    Sólo si el país era el de mayor o menor población se vuelven a
+    buscar los extremos, y únicamente entre los países de ese continente.
+    """
+    clave = pais['continente'].strip().lower()
+    resumen = continentes[clave]
+    resumen["paises"].remove(pais)
+    resumen["poblacion_total"] -= pais['poblacion']
+    resumen["superficie_total"] -= pais['superficie']
+    if not resumen["paises"]:
+        del continentes[clave]
+        return
+    if resumen["mayor"] is pais:
+        resumen["mayor"] = max(resumen["paises"], key=obtener_poblacion)
+    if resumen["menor"] is pais:
+        resumen["menor"] = min(resumen["paises"], key=obtener_poblacion)
+
+def cambiar_en_resumen(continentes, pais, poblacion_anterior, superficie_anterior):
+    """
+    Actualiza el resumen del continente de un país cuya población o
+    superficie cambió, sin cambiar el orden de sus países.
+    """
+    resumen = continentes[pais['continente'].strip().lower()]
+    resumen["poblacion_total"] += pais['poblacion'] - poblacion_anterior
+    resumen["superficie_total"] += pais['superficie'] - superficie_anterior
+    if resumen["mayor"] is pais or resumen["menor"] is pais:
+        ## El país era un extremo: se vuelven a buscar entre los de su continente
+        resumen["mayor"] = max(resumen["paises"], key=obtener_poblacion)
+        resumen["menor"] = min(resumen["paises"], key=obtener_poblacion)
+    else:
+        if pais['poblacion'] > resumen["mayor"]['poblacion']:
+            resumen["mayor"] = pais
+        if pais['poblacion'] < resumen["menor"]['poblacion']:
+            resumen["menor"] = pais
+
+def mostrar_resumen_continentes(lista_paises):
+    """
+    Muestra, para cada continente, la cantidad de países, la población
+    total y promedio, la superficie total, la densidad y los países
+    con mayor y menor población. Los datos salen de los resúmenes
+    ya calculados, sin recorrer los países.
+    """
+    asegurar_indices(lista_paises)
+    print("\n--- Resumen por Continente ---")
+    for resumen in indices["continentes"].values():
+        cantidad = len(resumen["paises"])
+        promedio_poblacion = resumen["poblacion_total"] / cantidad
+        if resumen["superficie_total"] > 0:
+            densidad = f"{resumen['poblacion_total'] / resumen['superficie_total']:,.2f} hab/km²"
+        else:
+            densidad = "sin superficie"
+        print(f"  -> {resumen['continente']}: {cantidad} país(es)")
+        print(f"     Población total: {resumen['poblacion_total']:,} hab. | Promedio: {promedio_poblacion:,.0f} hab.")
+        print(f"     Superficie total: {resumen['superficie_total']:,} km² | Densidad: {densidad}")
+        print(f"     Mayor población: {resumen['mayor']['nombre']} ({resumen['mayor']['poblacion']:,} hab.)")
+        print(f"     Menor población: {resumen['menor']['nombre']} ({resumen['menor']['poblacion']:,} hab.)")
+
+
+# ==========================================
+#          Funciones de Similitud
+# ==========================================
+
+## Para buscar países parecidos en población y superficie, cada país es un
+## punto (log10(1 + población), log10(1 + superficie)): una distancia de 1
+## equivale a un factor de 10 en alguno de los dos valores. Los puntos se
+## guardan en un árbol k-d por continente. Las altas se insertan en el
+## árbol, las bajas y los cambios marcan el nodo como borrado (y los
+## cambios insertan uno nuevo), y el árbol se rearma balanceado cuando
+## tiene más borrados que vivos o se duplicó desde la última vez.
+MINIMO_REARMADO = 16
+
+def coordenadas_similitud(pais):
+    """
+    Retorna el punto que representa al país en las búsquedas de similitud.
+    """
+    return (math.log10(1 + pais['poblacion']), math.log10(1 + pais['superficie']))
+
+def nuevo_nodo_kd(pais):
+    """
+    Crea el nodo del árbol k-d de un país.
+    """
+    return {
+        "punto": coordenadas_similitud(pais),
+        "pais": pais,
+        "clave": pais['continente'].strip().lower(),
+        "eje": 0,
+        "izq": None,
+        "der": None,
+        "borrado": False,
+    }
+
+def nuevo_arbol_kd():
+    """
+    Crea un árbol k-d vacío. "base" es la cantidad de nodos vivos con la
+    que se armó por última vez e "insertados" los agregados desde entonces.
+    """
+    return {"raiz": None, "vivos": 0, "borrados": 0, "insertados": 0, "base": 0}
+
+def armar_kd(nodos, eje=0):
+    """
+    Arma un árbol balanceado con los nodos: el de la mediana según el eje
+    queda en la raíz y los demás se reparten a izquierda y derecha.
+    Retorna la raíz.
+    """
+    if not nodos:
+        return None
+    nodos.sort(key=lambda nodo: nodo["punto"][eje])
+    medio = len(nodos) // 2
+    raiz = nodos[medio]
+    raiz["eje"] = eje
+    raiz["izq"] = armar_kd(nodos[:medio], 1 - eje)
+    raiz["der"] = armar_kd(nodos[medio + 1:], 1 - eje)
+    return raiz
+
+def nodos_vivos_kd(arbol):
+    """
+    Retorna la lista de nodos no borrados del árbol.
+    """
+    vivos = []
+    pendientes = [arbol["raiz"]] if arbol["raiz"] is not None else []
+    while pendientes:
+        nodo = pendientes.pop()
+        if not nodo["borrado"]:
+            vivos.append(nodo)
+        for hijo in (nodo["izq"], nodo["der"]):
+            if hijo is not None:
+                pendientes.append(hijo)
+    return vivos
+
+def rearmar_kd(arbol, nodos=None):
+    """
+    Vuelve a armar el árbol balanceado sólo con los nodos vivos.
+    """
+    if nodos is None:
+        nodos = nodos_vivos_kd(arbol)
+    arbol["raiz"] = armar_kd(nodos)
+    arbol["vivos"] = len(nodos)
+    arbol["borrados"] = 0
+    arbol["insertados"] = 0
+    arbol["base"] = len(nodos)
+
+def insertar_kd(arbol, nodo):
+    """
+    Agrega un nodo como hoja del árbol (sin rebalancear).
+    """
+    arbol["vivos"] += 1
+    arbol["insertados"] += 1
+    if arbol["raiz"] is None:
+        nodo["eje"] = 0
+        arbol["raiz"] = nodo
+        return
+    actual = arbol["raiz"]
+    while True:
+        eje = actual["eje"]
+        lado = "izq" if nodo["punto"][eje] < actual["punto"][eje] else "der"
+        if actual[lado] is None:
+            nodo["eje"] = 1 - eje
+            actual[lado] = nodo
+            return
+        actual = actual[lado]
+
+def asegurar_similitud(lista_paises):
+    """
+    Arma los árboles de la lista si todavía no existen
+    (o si fueron armados para otra lista).
+    """
+    with estado_carga["candado"]:
+        if similitud["lista"] is lista_paises:
+            return
+        por_continente = {}
+        similitud["nodos"] = {}
+        for pais in paises_vigentes(lista_paises):
+            nodo = nuevo_nodo_kd(pais)
+            por_continente.setdefault(nodo["clave"], []).append(nodo)
+            similitud["nodos"][id(pais)] = nodo
+        similitud["arboles"] = {}
+        for clave, nodos in por_continente.items():
+            arbol = nuevo_arbol_kd()
+            rearmar_kd(arbol, nodos)
+            similitud["arboles"][clave] = arbol
+        similitud["lista"] = lista_paises
+
+def agregar_a_similitud(lista_paises, pais):
+    """
+    Agrega un país a los árboles de la lista (si ya estaban armados).
+    """
+    if similitud["lista"] is not lista_paises:
+        return
+    nodo = nuevo_nodo_kd(pais)
+    arbol = similitud["arboles"].setdefault(nodo["clave"], nuevo_arbol_kd())
+    insertar_kd(arbol, nodo)
+    similitud["nodos"][id(pais)] = nodo
+    if arbol["insertados"] > max(arbol["base"], MINIMO_REARMADO):
+        rearmar_kd(arbol)
+
+def quitar_de_similitud(lista_paises, pais):
+    """
+    Marca como borrado el nodo del país en los árboles de la lista
+    (si ya estaban armados).
+    """
+    if similitud["lista"] is not lista_paises:
+        return
+    nodo = similitud["nodos"].pop(id(pais), None)
+    if nodo is None:
+        return
+    nodo["borrado"] = True
+    arbol = similitud["arboles"][nodo["clave"]]
+    arbol["vivos"] -= 1
+    arbol["borrados"] += 1
+    if arbol["vivos"] == 0:
+        del similitud["arboles"][nodo["clave"]]
+    elif arbol["borrados"] > max(arbol["vivos"], MINIMO_REARMADO):
+        rearmar_kd(arbol)
+
+def arboles_a_consultar(continente):
+    """
+    Retorna los árboles del continente indicado, o todos si no se indica.
+    """
+    if continente is None:
+        return list(similitud["arboles"].values())
+    arbol = similitud["arboles"].get(continente.strip().lower())
+    return [arbol] if arbol is not None else []
+
+def paises_mas_parecidos(lista_paises, pais_referencia, cantidad, continente=None):
+    """
+    Retorna los "cantidad" países más parecidos a pais_referencia en
+    población y superficie (sin incluirlo), como lista de
+    (distancia, país) de menor a mayor distancia.
+
+    La búsqueda es "primero el mejor": se revisa siempre el subárbol con
+    menor distancia mínima posible, de todos los árboles a la vez, y se
+    termina cuando ninguno pendiente puede mejorar los encontrados.
+    """
+    asegurar_similitud(lista_paises)
+    objetivo = coordenadas_similitud(pais_referencia)
+    ## Montículo con los mejores hasta ahora: (-distancia², id, país)
+    mejores = []
+    ## Montículo de subárboles pendientes: (distancia² mínima posible, orden, nodo);
+    ## "orden" desempata para no comparar nodos
+    orden = itertools.count()
+    pendientes = [(0.0, next(orden), arbol["raiz"]) for arbol in arboles_a_consultar(continente)
+                  if arbol["raiz"] is not None]
+    heapq.heapify(pendientes)
+    while pendientes:
+        minima, _, nodo = heapq.heappop(pendientes)
+        if len(mejores) == cantidad and minima >= -mejores[0][0]:
+            break
+        pais = nodo["pais"]
+        if not nodo["borrado"] and pais is not pais_referencia:
+            distancia = (nodo["punto"][0] - objetivo[0]) ** 2 + (nodo["punto"][1] - objetivo[1]) ** 2
+            if len(mejores) < cantidad:
+                heapq.heappush(mejores, (-distancia, id(pais), pais))
+            elif distancia < -mejores[0][0]:
+                heapq.heapreplace(mejores, (-distancia, id(pais), pais))
+        diferencia = objetivo[nodo["eje"]] - nodo["punto"][nodo["eje"]]
+        cercano, lejano = (nodo["izq"], nodo["der"]) if diferencia < 0 else (nodo["der"], nodo["izq"])
+        if cercano is not None:
+            heapq.heappush(pendientes, (minima, next(orden), cercano))
+        if lejano is not None:
+            heapq.heappush(pendientes, (max(minima, diferencia ** 2), next(orden), lejano))
+    return [(math.sqrt(-distancia), pais) for distancia, _, pais in sorted(mejores, reverse=True)]
+
+def paises_dentro_de_radio(lista_paises, pais_referencia, radio, continente=None):
+    """
+    Retorna los países a distancia "radio" o menos de pais_referencia
+    (sin incluirlo), como lista de (distancia, país) de menor a mayor.
+    """
+    asegurar_similitud(lista_paises)
+    objetivo = coordenadas_similitud(pais_referencia)
+    radio_cuadrado = radio ** 2
+    encontrados = []
+    for arbol in arboles_a_consultar(continente):
+        pendientes = [arbol["raiz"]] if arbol["raiz"] is not None else []
+        while pendientes:
+            nodo = pendientes.pop()
+            pais = nodo["pais"]
+            if not nodo["borrado"] and pais is not pais_referencia:
+                distancia = (nodo["punto"][0] - objetivo[0]) ** 2 + (nodo["punto"][1] - objetivo[1]) ** 2
+                if distancia <= radio_cuadrado:
+                    encontrados.append((math.sqrt(distancia), pais))
+            diferencia = objetivo[nodo["eje"]] - nodo["punto"][nodo["eje"]]
+            if nodo["izq"] is not None and diferencia <= radio:
+                pendientes.append(nodo["izq"])
+            if nodo["der"] is not None and diferencia >= -radio:
+                pendientes.append(nodo["der"])
+    encontrados.sort(key=lambda par: par[0])
+    return encontrados
+
+# ==========================================
+#             Funciones de Historial
+# ==========================================
+
+def ruta_asociada(nombre_archivo, sufijo):
+    """
+    Retorna el archivo auxiliar "<base>_<sufijo>.csv" de un archivo de
+    datos, o "<sufijo>.csv" dentro del directorio si usa fragmentos.
+    """
+    if es_particionado(nombre_archivo):
+        return os.path.join(nombre_archivo, sufijo + ".csv")
+    base = nombre_archivo
+    if os.path.splitext(base)[1].lower() in COMPRESORES:
+        base = os.path.splitext(base)[0]
+    return os.path.splitext(base)[0] + "_" + sufijo + ".csv"
+
+def ruta_historial(nombre_archivo):
+    """
+    Retorna el archivo donde se guarda el historial de un archivo de datos
+    (por ejemplo "paises_historial.csv" para "paises.csv").
+    """
+    return ruta_asociada(nombre_archivo, "historial")
+
+def nueva_serie():
+    """
+    Crea una serie vacía de valores por año.
+
+    Años y valores se guardan en arrays con codificación delta: el primer
+    elemento es el valor real y cada uno de los siguientes es la diferencia
+    con el anterior. Los años quedan ordenados de menor a mayor.
+    "ultimo_anio" y "ultimo_valor" permiten agregar al final sin decodificar.
+    "decodificada" guarda el resultado de decodificar_serie hasta que la
+    serie cambie.
+    """
+    return {
+        "anios": array.array("i"),
+        "valores": array.array("q"),
+        "ultimo_anio": None,
+        "ultimo_valor": None,
+        "decodificada": None,
+    }
+
+def decodificar_serie(serie):
+    """
+    Retorna (anios, valores) de la serie como listas de valores reales.
+    Las listas quedan guardadas en la serie: no hay que modificarlas.
+    """
+    if serie.get("decodificada") is None:
+        serie["decodificada"] = (list(itertools.accumulate(serie["anios"])),
+                                 list(itertools.accumulate(serie["valores"])))
+    return serie["decodificada"]
+
+def codificar_serie(anios, valores):
+    """
+    Arma una serie a partir de listas de años (ordenados) y valores reales.
+    """
+    serie = nueva_serie()
+    for anio, valor in zip(anios, valores):
+        agregar_a_serie(serie, anio, valor)
+    return serie
+
+def agregar_a_serie(serie, anio, valor):
+    """
+    Registra el valor de un año en la serie.
+
+    Agregar un año posterior al último (el caso habitual) es O(1); si el
+    año ya existe se reemplaza su valor y si es anterior se recodifica.
+    """
+    if serie["ultimo_anio"] is None:
+        serie["anios"].append(anio)
+        serie["valores"].append(valor)
+    elif anio > serie["ultimo_anio"]:
+        serie["anios"].append(anio - serie["ultimo_anio"])
+        serie["valores"].append(valor - serie["ultimo_valor"])
+    elif anio == serie["ultimo_anio"]:
+        serie["valores"][-1] += valor - serie["ultimo_valor"]
+    else:
+        anios, valores = (list(datos) for datos in decodificar_serie(serie))
+        posicion = bisect.bisect_left(anios, anio)
+        if anios[posicion] == anio:
+            valores[posicion] = valor
+        else:
+            anios.insert(posicion, anio)
+            valores.insert(posicion, valor)
+        serie.update(codificar_serie(anios, valores))
+        return
+    serie["ultimo_anio"] = anio
+    serie["ultimo_valor"] = valor
+    serie["decodificada"] = None
+
+def valor_en_anio(serie, anio):
+    """
+    Retorna el valor vigente en un año (el del último año registrado que
+    no sea posterior), o None si la serie empieza después.
+
+    Desde el último año registrado en adelante no hace falta decodificar;
+    para años anteriores se busca en la serie decodificada (que se guarda).
+    """
+    if serie["ultimo_anio"] is None:
+        return None
+    if anio >= serie["ultimo_anio"]:
+        return serie["ultimo_valor"]
+    anios, valores = decodificar_serie(serie)
+    posicion = bisect.bisect_right(anios, anio)
+    if posicion == 0:
+        return None
+    return valores[posicion - 1]
+
+def valores_entre_anios(serie, desde, hasta):
+    """
+    Retorna la lista de (anio, valor) registrados entre "desde" y "hasta" (inclusive).
+    """
+    anios, valores = decodificar_serie(serie)
+    inicio = bisect.bisect_left(anios, desde)
+    fin = bisect.bisect_right(anios, hasta)
+    return list(zip(anios[inicio:fin], valores[inicio:fin]))
+
+def obtener_serie(nombre, campo):
+    """
+    Retorna la serie de un campo ("poblacion" o "superficie") de un país, o None.
+    """
+    series_pais = historial["series"].get(nombre.strip().lower())
+    if series_pais is None:
+        return None
+    return series_pais.get(campo)
+
+def registrar_historial(nombre, campo, anio, valor, valor_anterior=None, anio_anterior=None):
+    """
+    Agrega al historial del país el valor de un campo para un año.
+
+    Si el país todavía no tenía historial de ese campo y el valor cambia,
+    el valor anterior se registra para no perderlo: en "anio_anterior" (un
+    año en que se sabe que era el vigente) o, si no se indica o coincide
+    con "anio", en "anio - 1". Ese "anio - 1" es sólo una marca de "antes
+    de anio": no significa que el valor se haya medido en ese año.
+    """
+    series_pais = historial["series"].setdefault(nombre.strip().lower(), {})
+    serie = series_pais.get(campo)
+    if serie is None:
+        serie = nueva_serie()
+        series_pais[campo] = serie
+        if valor_anterior is not None and valor_anterior != valor:
+            if anio_anterior is None or anio_anterior == anio:
+                anio_anterior = anio - 1
+            agregar_a_serie(serie, anio_anterior, valor_anterior)
+    agregar_a_serie(serie, anio, valor)
+    historial["modificado"] = True
+
+def texto_deltas(numeros):
+    """
+    Convierte un array de deltas en texto separado por ";" para el CSV.
+    """
+    return ";".join(str(numero) for numero in numeros)
+
+def cargar_historial(nombre_archivo):
+    """
+    Carga el historial del archivo de datos (si existe).
+
+    Cada fila del CSV de historial tiene nombre, campo, y los años y
+    valores ya codificados con deltas, así que no hace falta recalcularlos.
+    Se omiten las series de los países dados de baja que quedaron en el
+    archivo porque no se guardó después de la baja.
+    """
+    historial["series"] = {}
+    historial["modificado"] = False
+    ruta = ruta_historial(nombre_archivo)
+    if not os.path.isfile(ruta):
+        return
+    dados_de_baja = {nombre for nombre, _ in leer_bajas(nombre_archivo)}
+    with abrir_archivo(ruta, "r") as archivo:
+        for fila in csv.DictReader(archivo):
+            if fila['nombre'].strip().lower() in dados_de_baja:
+                historial["modificado"] = True
+                continue
+            try:
+                anios = array.array("i", [int(numero) for numero in fila['anios'].split(";")])
+                valores = array.array("q", [int(numero) for numero in fila['valores'].split(";")])
+            except (ValueError, AttributeError):
+                print(f"Error: El historial de '{fila['nombre']}' tiene datos no numéricos. Omitiendo.")
+                continue
+            if len(anios) != len(valores) or fila['campo'] not in ("poblacion", "superficie"):
+                print(f"Error: El historial de '{fila['nombre']}' está incompleto. Omitiendo.")
+                continue
+            serie = nueva_serie()
+            serie["anios"] = anios
+            serie["valores"] = valores
+            serie["ultimo_anio"] = sum(anios)
+            serie["ultimo_valor"] = sum(valores)
+            historial["series"].setdefault(fila['nombre'].strip().lower(), {})[fila['campo']] = serie
+
+def guardar_historial(nombre_archivo):
+    """
+    Guarda el historial en su archivo, con las series codificadas con deltas.
+    """
+    with abrir_archivo(ruta_historial(nombre_archivo), "w") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(["nombre", "campo", "anios", "valores"])
+        for nombre, series_pais in historial["series"].items():
+            for campo, serie in series_pais.items():
+                escritor.writerow([nombre, campo, texto_deltas(serie["anios"]), texto_deltas(serie["valores"])])
+    historial["modificado"] = False
+
+def totales_por_anio(campo):
+    """
+    Retorna una lista de (anio, total, cantidad_paises) con la suma de los
+    valores vigentes de "campo" en cada año que aparece en el historial.
+
+    Como cada serie guarda diferencias, el total de un año es la suma de
+    todas las diferencias registradas hasta ese año: alcanza con ordenar
+    los puntos una vez, sin decodificar cada serie por año.
+    """
+    cambios = {}
+    for series_pais in historial["series"].values():
+        serie = series_pais.get(campo)
+        if serie is None:
+            continue
+        anio = 0
+        primero = True
+        for delta_anio, delta_valor in zip(serie["anios"], serie["valores"]):
+            anio += delta_anio
+            total, paises = cambios.get(anio, (0, 0))
+            cambios[anio] = (total + delta_valor, paises + (1 if primero else 0))
+            primero = False
+
+    resultado = []
+    total = 0
+    cantidad = 0
+    for anio in sorted(cambios):
+        total += cambios[anio][0]
+        cantidad += cambios[anio][1]
+        resultado.append((anio, total, cantidad))
+    return resultado
+
+def mostrar_evolucion():
+    """
+    Muestra, año por año, la población y superficie totales de los
+    países que tienen historial.
+    """
+    poblaciones = {}
+    for anio, total, cantidad in totales_por_anio("poblacion"):
+        poblaciones[anio] = (total, cantidad)
+    superficies = {}
+    for anio, total, cantidad in totales_por_anio("superficie"):
+        superficies[anio] = total
+    if not poblaciones and not superficies:
+        return
+
+    ## En los años en que un campo no cambió se mantiene su último total
+    print("\n--- Evolución según el historial ---")
+    poblacion, cantidad, superficie = 0, 0, None
+    for anio in sorted(set(poblaciones) | set(superficies)):
+        poblacion, cantidad = poblaciones.get(anio, (poblacion, cantidad))
+        superficie = superficies.get(anio, superficie)
+        sup_formateada = f"{superficie:,} km²" if superficie is not None else "- km²"
+        print(f"  -> {anio}: {poblacion:,} hab. ({cantidad} país(es) con datos) | {sup_formateada}")
+
+
+# ==========================================
+#       Funciones de Estadísticas Aproximadas
+# ==========================================
+
+## Estas funciones recorren un archivo una sola vez sin cargarlo, con
+## memoria acotada, para archivos demasiado grandes para mostrar_estadisticas.
+##
+## Cuantiles e histogramas (sketch KLL, K_CUANTILES elementos por nivel):
+##   el rango de cada cuantil tiene un error de a lo sumo ~1.65% de las
+##   filas con 99% de confianza (para K_CUANTILES = 200). Por ejemplo, la
+##   "mediana" informada está entre los cuantiles 0.4835 y 0.5165. Cada
+##   barra del histograma hereda el error de sus dos límites.
+## Frecuencia de continentes (count-min, ANCHO_CM x PROFUNDIDAD_CM):
+##   nunca subestima; sobrestima en a lo sumo e / ANCHO_CM (~0.1%) de las
+##   filas con probabilidad 1 - e^-PROFUNDIDAD_CM (~99.3%). Se siguen los
+##   LIMITE_CONTINENTES continentes con mayor frecuencia estimada.
+## Cantidad de filas, sumas, mínimos y máximos: exactos.
+K_CUANTILES = 200
+ANCHO_CM = 2719
+PROFUNDIDAD_CM = 5
+LIMITE_CONTINENTES = 32
+CUANTILES_A_MOSTRAR = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+def nuevo_kll(k=K_CUANTILES):
+    """
+    Crea un sketch KLL vacío. "niveles" es una lista de listas: cada valor
+    del nivel h representa 2**h valores del archivo.
+    """
+    return {"k": k, "niveles": [[]], "n": 0, "tamano": 0, "capacidad": k}
+
+def capacidad_nivel(sketch, nivel):
+    """
+    Cantidad de valores que entran en un nivel antes de compactarlo:
+    K_CUANTILES en el nivel más alto, 2/3 de eso en el siguiente, etc.
+    """
+    profundidad = len(sketch["niveles"]) - 1 - nivel
+    return max(2, int(sketch["k"] * (2 / 3) ** profundidad))
+
+def agregar_kll(sketch, valor):
+    """
+    Agrega un valor al sketch, compactando si se llenó.
+    """
+    sketch["niveles"][0].append(valor)
+    sketch["n"] += 1
+    sketch["tamano"] += 1
+    if sketch["tamano"] >= sketch["capacidad"]:
+        compactar_kll(sketch)
+
+def compactar_kll(sketch):
+    """
+    Compacta el primer nivel lleno: lo ordena y pasa al nivel siguiente uno
+    de cada dos valores (empezando al azar por el primero o el segundo),
+    que desde ahí valen el doble.
+    """
+    niveles = sketch["niveles"]
+    for nivel, valores in enumerate(niveles):
+        if len(valores) < capacidad_nivel(sketch, nivel):
+            continue
+        if nivel + 1 == len(niveles):
+            niveles.append([])
+            sketch["capacidad"] = sum(capacidad_nivel(sketch, h) for h in range(len(niveles)))
+        valores.sort()
+        ## Con cantidad impar queda un valor en el nivel, así el peso total no cambia
+        sobrante = [valores.pop()] if len(valores) % 2 else []
+        promovidos = valores[random.getrandbits(1)::2]
+        niveles[nivel + 1].extend(promovidos)
+        niveles[nivel] = sobrante
+        sketch["tamano"] -= len(promovidos)
+        return
+
+def valores_con_peso_kll(sketch):
+    """
+    Retorna los valores del sketch ordenados, junto con su peso.
+    """
+    pares = []
+    for nivel, valores in enumerate(sketch["niveles"]):
+        peso = 2 ** nivel
+        pares.extend((valor, peso) for valor in valores)
+    pares.sort()
+    return pares
+
+def cuantiles_kll(sketch, fracciones):
+    """
+    Retorna el valor aproximado de cada cuantil pedido (fracciones entre 0 y 1).
+    """
+    pares = valores_con_peso_kll(sketch)
+    resultado = []
+    for fraccion in fracciones:
+        objetivo = fraccion * sketch["n"]
+        acumulado = 0
+        valor_cuantil = pares[-1][0] if pares else 0
+        for valor, peso in pares:
+            acumulado += peso
+            if acumulado >= objetivo:
+                valor_cuantil = valor
+                break
+        resultado.append(valor_cuantil)
+    return resultado
+
+def histograma_kll(sketch, limites):
+    """
+    Retorna la cantidad aproximada de valores en cada intervalo
+    [limites[i], limites[i+1]) (el último incluye a limites[-1]).
+    """
+    pares = valores_con_peso_kll(sketch)
+    cantidades = [0] * (len(limites) - 1)
+    for valor, peso in pares:
+        posicion = bisect.bisect_right(limites, valor) - 1
+        posicion = min(max(posicion, 0), len(cantidades) - 1)
+        cantidades[posicion] += peso
+    return cantidades
+
+def limites_logaritmicos(minimo, maximo):
+    """
+    Límites de histograma en potencias de 10 que cubren [minimo, maximo]
+    (empezando en 0 si el mínimo es 0).
+    """
+    potencia = 1
+    while potencia * 10 <= minimo:
+        potencia *= 10
+    limites = [0] if minimo == 0 else []
+    limites.append(potencia)
+    while potencia <= maximo:
+        potencia *= 10
+        limites.append(potencia)
+    return limites
+
+def nuevo_count_min():
+    """
+    Crea un sketch count-min vacío para contar continentes.
+    "candidatos" es {continente normalizado: [frecuencia estimada, nombre]}
+    con a lo sumo LIMITE_CONTINENTES entradas.
+    """
+    return {
+        "tabla": [array.array("q", bytes(8 * ANCHO_CM)) for _ in range(PROFUNDIDAD_CM)],
+        "total": 0,
+        "candidatos": {},
+    }
+
+def columnas_count_min(clave):
+    """
+    Retorna la columna de cada fila de la tabla para la clave
+    (una función de hash independiente por fila).
+    """
+    resumen = hashlib.blake2b(clave.encode("utf-8"), digest_size=8 * PROFUNDIDAD_CM).digest()
+    return [numero % ANCHO_CM for numero in struct.unpack(f"<{PROFUNDIDAD_CM}Q", resumen)]
+
+def sumar_count_min(sketch, nombre):
+    """
+    Cuenta una aparición del continente y actualiza los candidatos.
+    """
+    clave = nombre.strip().lower()
+    estimacion = None
+    for fila, columna in zip(sketch["tabla"], columnas_count_min(clave)):
+        fila[columna] += 1
+        if estimacion is None or fila[columna] < estimacion:
+            estimacion = fila[columna]
+    sketch["total"] += 1
+
+    candidatos = sketch["candidatos"]
+    if clave in candidatos:
+        candidatos[clave][0] = estimacion
+    elif len(candidatos) < LIMITE_CONTINENTES:
+        candidatos[clave] = [estimacion, nombre.strip()]
+    else:
+        ## Reemplaza al candidato menos frecuente si este lo supera
+        menor = min(candidatos, key=lambda c: candidatos[c][0])
+        if estimacion > candidatos[menor][0]:
+            del candidatos[menor]
+            candidatos[clave] = [estimacion, nombre.strip()]
+
+def estimar_count_min(sketch, nombre):
+    """
+    Retorna la frecuencia estimada del continente (nunca menor que la real).
+    """
+    clave = nombre.strip().lower()
+    return min(fila[columna] for fila, columna in zip(sketch["tabla"], columnas_count_min(clave)))
+
+def nuevo_resumen_campo():
+    """
+    Acumuladores de un campo numérico: exactos (suma, mínimo, máximo)
+    y el sketch para cuantiles.
+    """
+    return {"suma": 0, "minimo": None, "maximo": None, "kll": nuevo_kll()}
+
+def sumar_a_resumen_campo(resumen, pais, campo):
+    """
+    Agrega el valor del campo del país a los acumuladores.
+    """
+    valor = pais[campo]
+    resumen["suma"] += valor
+    if resumen["minimo"] is None or valor < resumen["minimo"][0]:
+        resumen["minimo"] = (valor, pais['nombre'])
+    if resumen["maximo"] is None or valor > resumen["maximo"][0]:
+        resumen["maximo"] = (valor, pais['nombre'])
+    agregar_kll(resumen["kll"], valor)
+
+def calcular_estadisticas_aproximadas(nombre_archivo):
+    """
+    Recorre el archivo (o directorio por continente) una sola vez y
+    retorna los acumuladores de población, superficie y continentes.
+    Los nombres repetidos no se descartan, porque eso requeriría
+    recordar todos los nombres leídos.
+    """
+    resultado = {
+        "filas": 0,
+        "poblacion": nuevo_resumen_campo(),
+        "superficie": nuevo_resumen_campo(),
+        "continentes": nuevo_count_min(),
+    }
+    for pais in leer_paises(nombre_archivo, omitir_repetidos=False):
+        resultado["filas"] += 1
+        sumar_a_resumen_campo(resultado["poblacion"], pais, "poblacion")
+        sumar_a_resumen_campo(resultado["superficie"], pais, "superficie")
+        sumar_count_min(resultado["continentes"], pais['continente'])
+    return resultado
+
+def mostrar_resumen_campo(resumen, filas, titulo, unidad):
+    """
+    Muestra los valores exactos, los cuantiles y el histograma de un campo.
+    """
+    print(f"\n--- {titulo} ---")
+    print(f"Total: {resumen['suma']:,} {unidad} | Promedio: {resumen['suma'] / filas:,.2f} {unidad}")
+    print(f"Mínimo: {resumen['minimo'][1]} ({resumen['minimo'][0]:,} {unidad})")
+    print(f"Máximo: {resumen['maximo'][1]} ({resumen['maximo'][0]:,} {unidad})")
+    print("Cuantiles (aprox.):")
+    valores = cuantiles_kll(resumen["kll"], CUANTILES_A_MOSTRAR)
+    for fraccion, valor in zip(CUANTILES_A_MOSTRAR, valores):
+        print(f"  -> {fraccion * 100:>4g}%: {valor:,} {unidad}")
+    print("Histograma (aprox.):")
+    limites = limites_logaritmicos(resumen["minimo"][0], resumen["maximo"][0])
+    for desde, hasta, cantidad in zip(limites, limites[1:], histograma_kll(resumen["kll"], limites)):
+        print(f"  -> [{desde:,} - {hasta:,}): {cantidad:,} país(es)")
+
+def mostrar_estadisticas_aproximadas(resultado):
+    """
+    Muestra las estadísticas calculadas por calcular_estadisticas_aproximadas,
+    con el margen de error de cada parte.
+    """
+    filas = resultado["filas"]
+    if filas == 0:
+        print("No hay países para calcular estadísticas.")
+        return
+    print("\n" + "=" * 40)
+    print("     ESTADÍSTICAS APROXIMADAS")
+    print("=" * 40)
+    print(f"Filas leídas: {filas:,} (exacto)")
+    if filas < K_CUANTILES:
+        print("Con tan pocas filas todos los valores son exactos.")
+    else:
+        print("Totales, mínimos y máximos son exactos; los cuantiles y el histograma")
+        print(f"tienen un error de rango de ~1.65% de las filas ({filas * 0.0165:,.0f}).")
+    mostrar_resumen_campo(resultado["poblacion"], filas, "Población", "hab.")
+    mostrar_resumen_campo(resultado["superficie"], filas, "Superficie", "km²")
+
+    continentes = resultado["continentes"]
+    margen = math.e / ANCHO_CM * continentes["total"]
+    print("\n--- Continentes (aprox.) ---")
+    print(f"Cada frecuencia puede estar sobrestimada en hasta {margen:,.0f} fila(s).")
+    ## La estimación final de cada candidato puede superar la que tenía al agregarlo
+    estimaciones = [(estimar_count_min(continentes, nombre), nombre) for _, nombre in continentes["candidatos"].values()]
+    for estimacion, nombre in sorted(estimaciones, reverse=True):
+        print(f"  -> {nombre}: ~{estimacion:,} país(es)")
+    print("=" * 40)
+
+# ==========================================
+#       Funciones de Comparación de Archivos
+# ==========================================
+
+def huella_pais(pais):
+    """
+    Calcula una huella corta (8 bytes) de los datos de un país, para
+    comparar filas sin tener que guardar la fila completa en memoria.
+    """
+    datos = f"{pais['poblacion']}|{pais['superficie']}|{pais['continente'].strip().lower()}"
+    return hashlib.blake2b(datos.encode("utf-8"), digest_size=8).digest()
+
+def calcular_diferencias(origen, nombre_archivo_nuevo):
+    """
+    Compara los países de "origen" contra los de un archivo CSV nuevo.
+
+    "origen" puede ser el nombre de otro archivo CSV o una lista de países
+    ya cargada. Del origen sólo se guarda nombre normalizado -> huella; el
+    archivo nuevo se recorre una sola vez.
+
+    Retorna un diccionario con:
+    - "agregados": países que están sólo en el archivo nuevo.
+    - "cambiados": países con datos distintos (con los valores nuevos).
+    - "eliminados": nombres de los países que ya no están en el archivo nuevo.
+    """
+    if isinstance(origen, str):
+        paises_origen = leer_paises(origen)
+    else:
+        paises_origen = paises_vigentes(origen)
+
+    huellas = {}
+    for pais in paises_origen:
+        huellas[pais['nombre'].strip().lower()] = (huella_pais(pais), pais['nombre'])
+
+    agregados = []
+    cambiados = []
+    for pais in leer_paises(nombre_archivo_nuevo):
+        nombre_normalizado = pais['nombre'].strip().lower()
+        anterior = huellas.pop(nombre_normalizado, None)
+        if anterior is None:
+            agregados.append(pais)
+        elif anterior[0] != huella_pais(pais):
+            cambiados.append(pais)
 
+    ## Lo que quedó sin aparecer en el archivo nuevo fue eliminado
+    eliminados = []
+    for _, nombre in huellas.values():
+        eliminados.append(nombre)
 
-def cargar_paises(nombre_archivo):
+    return {"agregados": agregados, "cambiados": cambiados, "eliminados": eliminados}
+
+def mostrar_diferencias(diferencias):
     """
-    Cargar los datos de paises desde un archivo CSV.
+    Muestra en consola el resultado de calcular_diferencias.
+    """
+    print(f"\nAgregados: {len(diferencias['agregados'])} | "
+          f"Cambiados: {len(diferencias['cambiados'])} | "
+          f"Eliminados: {len(diferencias['eliminados'])}")
+    if diferencias['agregados']:
+        print("\n--- Países agregados ---")
+        mostrar_lista_paises(diferencias['agregados'])
+    if diferencias['cambiados']:
+        print("\n--- Países con datos cambiados (valores nuevos) ---")
+        mostrar_lista_paises(diferencias['cambiados'])
+    if diferencias['eliminados']:
+        print("\n--- Países eliminados ---")
+        for nombre in diferencias['eliminados']:
+            print(f"  -> {nombre}")
 
-    Valida la existencia del archivo y el formato numérico de
-    población y superficie.
+def aplicar_diferencias(nombre_archivo, lista_paises, diferencias):
     """
-    lista_paises = []
-    if os.path.isfile(nombre_archivo):
-        with open(nombre_archivo, mode='r', encoding='utf-8', newline='') as archivo:
-            lector_csv = csv.DictReader(archivo)
+    Aplica sobre la lista cargada desde "nombre_archivo" las altas,
+    cambios y bajas informados por calcular_diferencias y programa un
+    único guardado.
 
-            for fila in lector_csv:
-                # Valida si los campos no estan vacíos
-                if not fila['nombre'] or not fila['poblacion'] or not fila['superficie'] or not fila['continente']:
-                    print(f"Error: La fila con nombre '{fila['nombre']}' tiene campos vacíos. Omitiendo.")
-                    continue
-
-                # Valida si son datos numéricos
-                poblacion_str = fila['poblacion']
-                superficie_str = fila['superficie']
-
-                if not poblacion_str.isdigit() or not superficie_str.isdigit():
-                    print(f"Error: La fila para '{fila['nombre']}' contiene datos no numéricos. Omitiendo.")
-                    continue
-                
-                # Si todas las validaciones pasan, creamos el diccionario
-                pais = {
-                    "nombre": fila['nombre'],
-                    "poblacion": int(poblacion_str),
-                    "superficie": int(superficie_str),
-                    "continente": fila['continente']
-                }
-                lista_paises.append(pais)
-    return lista_paises
+    Retorna la cantidad de países modificados.
+    """
+    esperar_carga()
+    ## Con fragmentos hacen falta todos: los cambios y bajas pueden ser de cualquier continente
+    cargar_fragmentos_restantes(lista_paises)
+    asegurar_indices(lista_paises)
 
-def guardar_paises(nombre_archivo, lista_paises):
+    modificados = 0
+    for nuevo in diferencias['cambiados']:
+        pais = buscar_pais_por_nombre(lista_paises, nuevo['nombre'])
+        if pais is None:
+            print(f"Error: El país '{nuevo['nombre']}' ya no está en la lista. Omitiendo.")
+            continue
+        registrar_cambio(lista_paises, pais, nuevo['poblacion'], nuevo['superficie'], nuevo['continente'])
+        modificados += 1
+    for nuevo in diferencias['agregados']:
+        try:
+            registrar_alta(lista_paises, nuevo)
+        except ValueError as error:
+            print(f"Error: {error} Omitiendo.")
+            continue
+        modificados += 1
+    compactar = False
+    for nombre in diferencias['eliminados']:
+        pais = buscar_pais_por_nombre(lista_paises, nombre)
+        if pais is None:
+            continue
+        compactar = registrar_baja(nombre_archivo, lista_paises, pais) or compactar
+        modificados += 1
+
+    if compactar:
+        compactar_bajas(nombre_archivo, lista_paises)
+    elif modificados:
+        programar_guardado(nombre_archivo, lista_paises)
+    return modificados
+
+
+def actualizacion_masiva(lista_paises, nombre_archivo_cambios, anio=None):
     """
-    Guarda la lista de países en un archivo CSV.
+    Actualiza población y superficie de muchos países a partir de un CSV
+    con columnas nombre, poblacion y superficie (puede estar comprimido).
+
+    Primero se validan todas las filas, resolviendo cada nombre con el
+    índice de nombres; después se aplican los cambios y se programa un
+    único guardado.
+
+    Retorna un diccionario con la cantidad de "actualizados" y las listas
+    de "desconocidos" (nombres que no existen) e "invalidos" (número de
+    fila y nombre de las filas con datos vacíos o no numéricos).
     """
-    with open(nombre_archivo, mode="w", newline='', encoding='utf-8') as archivo:
-        escritor = csv.writer(archivo)
-        escritor.writerow(["nombre", "poblacion", "superficie", "continente"])
+    if anio is not None and not 1 <= anio <= datetime.date.today().year + 100:
+        raise ValueError(f"El año {anio} está fuera del rango permitido.")
+    esperar_carga()
+    ## El archivo de cambios no indica el continente: con fragmentos se cargan todos
+    cargar_fragmentos_restantes(lista_paises)
+    asegurar_indices(lista_paises)
+    cambios = []
+    desconocidos = []
+    invalidos = []
+    with abrir_archivo(nombre_archivo_cambios, "r") as archivo:
+        lector_csv = csv.DictReader(archivo)
+        if not lector_csv.fieldnames or not {"nombre", "poblacion", "superficie"} <= set(lector_csv.fieldnames):
+            raise ValueError("El archivo debe tener las columnas nombre, poblacion y superficie.")
+        ## La fila 1 es la cabecera
+        for numero_fila, fila in enumerate(lector_csv, start=2):
+            nombre = (fila['nombre'] or "").strip()
+            poblacion_str = (fila['poblacion'] or "").strip()
+            superficie_str = (fila['superficie'] or "").strip()
+            if not nombre or not poblacion_str.isdigit() or not superficie_str.isdigit():
+                invalidos.append((numero_fila, nombre))
+                continue
+            pais = indices["nombres"].get(nombre.lower())
+            if pais is None:
+                desconocidos.append(nombre)
+                continue
+            cambios.append((pais, int(poblacion_str), int(superficie_str)))
+
+    for pais, poblacion, superficie in cambios:
+        registrar_cambio(lista_paises, pais, poblacion, superficie, anio=anio)
+    if cambios:
+        programar_guardado(nombre_archivo, lista_paises)
+    return {"actualizados": len(cambios), "desconocidos": desconocidos, "invalidos": invalidos}
 
-        for pais in lista_paises:
-            escritor.writerow([pais['nombre'], pais['poblacion'], pais['superficie'], pais['continente']])
 
 # ==========================================
-#             Funciones de Validación
+#        Funciones de Memoria Compartida
 # ==========================================
 
-def validar_existencia_pais(lista_paises, nombre):
+## Un proceso publica los países en memoria compartida y otros procesos
+## (por ejemplo, los que arman informes) se conectan y consultan las
+## columnas sin leer el archivo ni copiar los datos.
+##
+## Segmento de control "<prefijo>": "PAISCTL1" y la versión publicada (uint64).
+## Segmento de datos "<prefijo>_<versión>", en el orden de bytes de la
+## máquina (sólo se comparte entre procesos de la misma máquina), con cada
+## sección alineada a 8 bytes:
+##   cabecera:    "PAISMEM1", cantidad de países, cantidad de continentes
+##                y versión (uint64 cada uno)
+##   poblacion:   int64 por país
+##   superficie:  int64 por país
+##   continente:  uint32 por país (posición en la tabla de continentes)
+##   nombres:     inicio de cada nombre (uint64, uno más que los países)
+##                y los nombres en UTF-8, uno tras otro
+##   continentes: lo mismo que nombres, para la tabla de continentes
+## Cada publicación crea un segmento de datos nuevo y después cambia la
+## versión del control, así los procesos conectados notan el cambio
+## (ver vista_vigente()) y nunca leen un segmento a medio escribir.
+PREFIJO_MEMORIA = "paises"
+MAGIA_CONTROL = b"PAISCTL1"
+MAGIA_MEMORIA = b"PAISMEM1"
+FORMATO_CONTROL = "=8sQ"
+FORMATO_CABECERA_MEMORIA = "=8sQQQ"
+
+def alinear(posicion):
     """
-    Valida si un país ya existe en la lista de países.
+    Redondea una posición al siguiente múltiplo de 8.
+    """
+    return (posicion + 7) // 8 * 8
 
-    Retorna True si el país existe, False en caso contrario.
+def tabla_de_textos(textos):
     """
-    nombre_normalizado = nombre.strip().lower()
-    for pais in lista_paises:
-        if pais['nombre'].strip().lower() == nombre_normalizado:
-            return True
-    return False
+    Retorna (inicios, datos) para guardar textos en memoria compartida:
+    los inicios (uint64, uno más que los textos) y los bytes UTF-8.
+    """
+    inicios = array.array("Q", [0])
+    datos = bytearray()
+    for texto in textos:
+        datos += texto.encode("utf-8")
+        inicios.append(len(datos))
+    return inicios, datos
 
-def buscar_pais_por_nombre(lista_paises, nombre_buscado):
+def abrir_memoria(nombre):
     """
-    Busca un país en la lista por su nombre.
+    Se conecta a un segmento de memoria compartida existente sin que el
+    resource_tracker lo borre al terminar este proceso (el segmento es
+    del proceso que lo publicó).
+    """
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        ## Antes de Python 3.13 no existe "track": se lo quitamos al tracker,
+        ## salvo que el segmento lo haya publicado este mismo proceso
+        memoria = shared_memory.SharedMemory(name=nombre)
+        propios = [memoria_compartida["control"], memoria_compartida["datos"]]
+        if not any(propio is not None and propio.name == memoria.name for propio in propios):
+            resource_tracker.unregister(memoria._name, "shared_memory")
+        return memoria
 
-    Retorna el diccionario del país si se encuentra, None en caso contrario.
+def publicar_paises(lista_paises, prefijo=PREFIJO_MEMORIA):
     """
-    nombre_normalizado = nombre_buscado.strip().lower()
-    for pais in lista_paises:
-        if pais['nombre'].strip().lower() == nombre_normalizado:
-            return pais
-    return None
+    Publica los países vigentes de la lista en memoria compartida y
+    retorna la versión publicada. Reemplaza la publicación anterior.
 
-def validar_cantidad(cantidad):
-    ## Valida si la cantidad ingresada es un número entero positivo.
-    if cantidad.isdigit() and int(cantidad) >= 0:
-        return True
-    else:
-        print("La cantidad debe ser un número entero positivo.")
-        return False
+    Los datos se preparan fuera del candado; la creación de segmentos y
+    el cambio de versión se hacen de a una publicación por vez.
+    """
+    with estado_carga["candado"]:
+        paises = list(paises_vigentes(lista_paises))
+    continentes = []
+    codigos_continente = {}
+    codigos = array.array("I")
+    for pais in paises:
+        codigo = codigos_continente.get(pais['continente'])
+        if codigo is None:
+            codigo = len(continentes)
+            codigos_continente[pais['continente']] = codigo
+            continentes.append(pais['continente'])
+        codigos.append(codigo)
+    secciones = [
+        array.array("q", (pais['poblacion'] for pais in paises)),
+        array.array("q", (pais['superficie'] for pais in paises)),
+        codigos,
+        *tabla_de_textos(pais['nombre'] for pais in paises),
+        *tabla_de_textos(continentes),
+    ]
+
+    with memoria_compartida["candado"]:
+        ## El control guarda la versión; si quedó uno de otra ejecución se sigue su numeración
+        control = memoria_compartida["control"]
+        if control is None:
+            try:
+                control = shared_memory.SharedMemory(name=prefijo, create=True, size=struct.calcsize(FORMATO_CONTROL))
+                struct.pack_into(FORMATO_CONTROL, control.buf, 0, MAGIA_CONTROL, 0)
+            except FileExistsError:
+                control = shared_memory.SharedMemory(name=prefijo)
+            memoria_compartida["control"] = control
+            memoria_compartida["prefijo"] = prefijo
+        version = struct.unpack_from(FORMATO_CONTROL, control.buf, 0)[1] + 1
+
+        tamano = alinear(struct.calcsize(FORMATO_CABECERA_MEMORIA))
+        for seccion in secciones:
+            tamano += alinear(len(seccion) * getattr(seccion, "itemsize", 1))
+        datos = shared_memory.SharedMemory(name=f"{prefijo}_{version}", create=True, size=max(tamano, 1))
+        struct.pack_into(FORMATO_CABECERA_MEMORIA, datos.buf, 0, MAGIA_MEMORIA, len(paises), len(continentes), version)
+        posicion = alinear(struct.calcsize(FORMATO_CABECERA_MEMORIA))
+        for seccion in secciones:
+            contenido = seccion.tobytes() if isinstance(seccion, array.array) else bytes(seccion)
+            datos.buf[posicion:posicion + len(contenido)] = contenido
+            posicion += alinear(len(contenido))
 
-def mostrar_lista_paises(lista_paises):
+        ## Recién con los datos completos se anuncia la versión nueva
+        struct.pack_into(FORMATO_CONTROL, control.buf, 0, MAGIA_CONTROL, version)
+        anterior = memoria_compartida["datos"]
+        memoria_compartida["datos"] = datos
+        memoria_compartida["version"] = version
+        if anterior is not None:
+            ## Los procesos conectados a la versión anterior la siguen viendo hasta cerrarla
+            anterior.close()
+            anterior.unlink()
+        return version
+
+def republicar(lista_paises):
     """
-    Muestra una lista de países (diccionarios) en un formato de tabla legible en consola.
+    Si este proceso publicó los países, publica una versión nueva con
+    los datos actuales (después de guardar o de una baja).
     """
-    if not lista_paises:
-        print("No hay países para mostrar.")
+    if memoria_compartida["datos"] is None:
         return
-    print("\n" + "=" * 70)
-    print(f"{'Nombre':<20} | {'Población':<15} | {'Superficie (km²)':>15} | {'Continente':>15}")
-    print("=" * 70)
+    try:
+        publicar_paises(lista_paises, memoria_compartida["prefijo"])
+    except OSError as error:
+        print(f"Error: No se pudo publicar la versión nueva en memoria compartida. {error}")
 
-    ## Datos de cada país
-    for pais in lista_paises:
-        ## se formatean los números con separadores de miles
-        pob_formateada = f"{pais['poblacion']:,}"
-        sup_formateada = f"{pais['superficie']:,}"
-        print(f"{pais['nombre']:<20} | {pob_formateada:<15} | {sup_formateada:>15} | {pais['continente']:>15}")
-    print("=" * 70)
+def retirar_publicacion():
+    """
+    Borra los segmentos publicados por este proceso. Se usa al salir.
+    """
+    with memoria_compartida["candado"]:
+        for clave in ("datos", "control"):
+            memoria = memoria_compartida[clave]
+            if memoria is not None:
+                memoria.close()
+                try:
+                    memoria.unlink()
+                except FileNotFoundError:
+                    pass
+                memoria_compartida[clave] = None
 
-def obtener_rango_numerico(tipo_dato):
+def conectar_vista(prefijo=PREFIJO_MEMORIA):
     """
-    Pide al usuario un rango numérico (mínimo y máximo) y lo valida usando la funcion "validar_cantidad".
-    "tipo_dato" es un string (ej: poblacion) para mostrar en los mensajes.
-    Retorna (min_val, max_val) como enteros.
+    Se conecta a los países publicados con ese prefijo y retorna la
+    "vista" (un diccionario con las columnas, sin copiarlas), o None si
+    no hay nada publicado. La vista se cierra con cerrar_vista().
     """
-    ## Pedir y validar el valor minimo
-    while True:
-        min_str = input(f"Ingrese la {tipo_dato} MÍNIMA: ").strip()
-        if validar_cantidad(min_str):
-            break
-    ## Pedir y validar el valor maximo
-    while True:
-        max_str = input(f"Ingrese la {tipo_dato} MAXIMA: ").strip()
-        if validar_cantidad(max_str):
+    if shared_memory is None:
+        return None
+    try:
+        control = abrir_memoria(prefijo)
+    except FileNotFoundError:
+        return None
+    ## Si justo se publica otra versión, la anterior puede desaparecer: se reintenta
+    for _ in range(10):
+        magia, version = struct.unpack_from(FORMATO_CONTROL, control.buf, 0)
+        if magia != MAGIA_CONTROL or version == 0:
             break
-    min_val = int(min_str)
-    max_val = int(max_str)
+        try:
+            datos = abrir_memoria(f"{prefijo}_{version}")
+        except FileNotFoundError:
+            continue
+        return armar_vista(prefijo, control, datos)
+    control.close()
+    return None
 
-    ## verificar que el minimo no sea mayor que el máximo
-    if min_val > max_val:
-        print(f"Error: El valor mínimo ({min_val}) no puede ser mayor que el valor máximo ({max_val}). Intercambiando valores.")
-        min_val, max_val = max_val, min_val
-    return min_val, max_val
+def armar_vista(prefijo, control, datos):
+    """
+    Arma la vista de un segmento de datos: cada columna es un memoryview
+    sobre la memoria compartida.
+    """
+    magia, cantidad, cantidad_continentes, version = struct.unpack_from(FORMATO_CABECERA_MEMORIA, datos.buf, 0)
+    if magia != MAGIA_MEMORIA:
+        raise ValueError(f"El segmento '{datos.name}' no tiene países publicados.")
+    vista = {
+        "prefijo": prefijo,
+        "version": version,
+        "cantidad": cantidad,
+        "control": control,
+        "datos": datos,
+        "columnas": [],
+    }
+    posicion = alinear(struct.calcsize(FORMATO_CABECERA_MEMORIA))
 
-def obtener_nombre(pais):
+    def columna(formato, elementos):
+        nonlocal posicion
+        tamano = elementos * struct.calcsize(formato)
+        memoria = datos.buf[posicion:posicion + tamano].cast(formato)
+        vista["columnas"].append(memoria)
+        posicion += alinear(tamano)
+        return memoria
+
+    vista["poblacion"] = columna("q", cantidad)
+    vista["superficie"] = columna("q", cantidad)
+    vista["codigos"] = columna("I", cantidad)
+    vista["inicios_nombres"] = columna("Q", cantidad + 1)
+    vista["nombres"] = columna("B", vista["inicios_nombres"][cantidad])
+    inicios = columna("Q", cantidad_continentes + 1)
+    textos = columna("B", inicios[cantidad_continentes])
+    ## La tabla de continentes es chica: se decodifica una vez
+    vista["continentes"] = [bytes(textos[inicios[i]:inicios[i + 1]]).decode("utf-8")
+                            for i in range(cantidad_continentes)]
+    return vista
+
+def cerrar_vista(vista):
     """
-    Función auxiliar para obtener el nombre de un país.
-    Usada para ordenar por nombre.
+    Libera las columnas de la vista y se desconecta de la memoria compartida.
     """
-    return pais['nombre'].lower()
+    for memoria in vista["columnas"]:
+        memoria.release()
+    vista["columnas"] = []
+    vista["datos"].close()
+    vista["control"].close()
 
-def obtener_poblacion(pais):
+def vista_vigente(vista):
     """
-    Función auxiliar para obtener la población de un país.
-    Usada para ordenar por población.
+    Retorna True si la vista corresponde a la última versión publicada.
     """
-    return pais['poblacion']
+    return struct.unpack_from(FORMATO_CONTROL, vista["control"].buf, 0)[1] == vista["version"]
 
-def obtener_superficie(pais):
+def actualizar_vista(vista):
     """
-    Función auxiliar para obtener la superficie de un país.
-    Usada para ordenar por superficie.
+    Si se publicó una versión nueva, cierra la vista y retorna una nueva
+    (o None si ya no hay nada publicado). Si no, retorna la misma vista.
     """
-    return pais['superficie']
+    if vista_vigente(vista):
+        return vista
+    prefijo = vista["prefijo"]
+    cerrar_vista(vista)
+    return conectar_vista(prefijo)
+
+def nombre_en_vista(vista, posicion):
+    """
+    Retorna el nombre del país en esa posición de la vista.
+    """
+    inicios = vista["inicios_nombres"]
+    return bytes(vista["nombres"][inicios[posicion]:inicios[posicion + 1]]).decode("utf-8")
 
+def valor_en_vista(vista, posicion, clave):
+    """
+    Retorna el valor de una columna (poblacion, superficie, densidad,
+    nombre o continente) del país en esa posición de la vista.
+    """
+    if clave == "nombre":
+        return nombre_en_vista(vista, posicion)
+    if clave == "continente":
+        return vista["continentes"][vista["codigos"][posicion]]
+    if clave == "densidad":
+        return calcular_densidad({"poblacion": vista["poblacion"][posicion],
+                                  "superficie": vista["superficie"][posicion]})
+    return vista[clave][posicion]
+
+def paises_de_vista(vista, posiciones):
+    """
+    Arma los diccionarios de país de las posiciones indicadas (para
+    mostrarlos o exportarlos con las funciones de siempre).
+    """
+    paises = []
+    for posicion in posiciones:
+        paises.append({
+            "nombre": nombre_en_vista(vista, posicion),
+            "poblacion": vista["poblacion"][posicion],
+            "superficie": vista["superficie"][posicion],
+            "continente": vista["continentes"][vista["codigos"][posicion]],
+        })
+    return paises
+
+def filtrar_vista_por_continente(vista, continente):
+    """
+    Retorna las posiciones de los países del continente (sin distinguir mayúsculas).
+    """
+    continente_normalizado = continente.strip().lower()
+    buscados = set()
+    for codigo, nombre in enumerate(vista["continentes"]):
+        if nombre.strip().lower() == continente_normalizado:
+            buscados.add(codigo)
+    codigos = vista["codigos"]
+    return [posicion for posicion in range(vista["cantidad"]) if codigos[posicion] in buscados]
+
+def filtrar_vista_por_rango(vista, clave, min_val, max_val):
+    """
+    Retorna las posiciones de los países cuyo valor de "clave"
+    (poblacion, superficie o densidad) está entre min_val y max_val.
+    """
+    if clave == "densidad":
+        return [posicion for posicion in range(vista["cantidad"])
+                if min_val <= valor_en_vista(vista, posicion, clave) <= max_val]
+    columna = vista[clave]
+    return [posicion for posicion in range(vista["cantidad"]) if min_val <= columna[posicion] <= max_val]
+
+def ordenar_vista(vista, clave, descendente=False, posiciones=None):
+    """
+    Retorna las posiciones (todas, o las indicadas) ordenadas por "clave".
+    """
+    if posiciones is None:
+        posiciones = range(vista["cantidad"])
+    if clave in ("poblacion", "superficie"):
+        return sorted(posiciones, key=vista[clave].__getitem__, reverse=descendente)
+    return sorted(posiciones, key=lambda posicion: valor_en_vista(vista, posicion, clave), reverse=descendente)
+
+def estadisticas_vista(vista):
+    """
+    Calcula las estadísticas generales de la vista: cantidad, totales,
+    promedios, países con mayor y menor población y un resumen por
+    continente (cantidad y totales). Retorna un diccionario (None si
+    no hay países).
+    """
+    cantidad = vista["cantidad"]
+    if cantidad == 0:
+        return None
+    poblacion = vista["poblacion"]
+    superficie = vista["superficie"]
+    codigos = vista["codigos"]
+    por_continente = {}
+    for codigo, nombre in enumerate(vista["continentes"]):
+        por_continente[codigo] = {"continente": nombre, "paises": 0, "poblacion_total": 0, "superficie_total": 0}
+    for posicion in range(cantidad):
+        resumen = por_continente[codigos[posicion]]
+        resumen["paises"] += 1
+        resumen["poblacion_total"] += poblacion[posicion]
+        resumen["superficie_total"] += superficie[posicion]
+    total_poblacion = sum(poblacion)
+    total_superficie = sum(superficie)
+    mayor = max(range(cantidad), key=poblacion.__getitem__)
+    menor = min(range(cantidad), key=poblacion.__getitem__)
+    return {
+        "cantidad": cantidad,
+        "poblacion_total": total_poblacion,
+        "superficie_total": total_superficie,
+        "promedio_poblacion": total_poblacion / cantidad,
+        "promedio_superficie": total_superficie / cantidad,
+        "mayor": paises_de_vista(vista, [mayor])[0],
+        "menor": paises_de_vista(vista, [menor])[0],
+        "continentes": list(por_continente.values()),
+    }
 
 # ==========================================
 #             Funciones de Menú
@@ -171,10 +3096,11 @@ def agregar_pais(lista_paises):
     # 1. Validar Nombre (no vacío y único)
     nombre = ""
     while True:
-        nombre = input("Ingrese el nombre del país: ").strip()
+        nombre = pedir_nombre_pais("Ingrese el nombre del país: ", lista_paises).strip()
         if not nombre:
             print("Error: El nombre no puede estar vacío.")
-        elif validar_existencia_pais(lista_paises, nombre):
+        elif validar_existencia_pais(lista_paises, nombre) or existe_en_fragmentos_sin_cargar(nombre) or (
+                not estado_carga["terminada"].is_set() and validar_existencia_pais(estado_carga["pendientes"], nombre)):
             print(f"Error: El país '{nombre}' ya existe en la lista.")
         else:
             break 
@@ -202,6 +3128,10 @@ def agregar_pais(lista_paises):
         else:
             break # Dato válido
 
+    ## Con fragmentos, el del continente tiene que estar cargado para poder guardarlo
+    ## (y para que registrar_alta controle el nombre también contra sus países)
+    asegurar_continente(lista_paises, continente)
+
     # Una vez todo validado, se agrega el país a la lista
     nuevo_pais = {
         "nombre": nombre,
@@ -209,9 +3139,16 @@ def agregar_pais(lista_paises):
         "superficie": int(superficie_str),
         "continente": continente
     }
-    lista_paises.append(nuevo_pais)
-    guardar_paises(nombre_archivo, lista_paises) # Guardamos
-    print(f"\n¡País '{nombre}' agregado exitosamente!")
+    try:
+        agregado = registrar_alta(lista_paises, nuevo_pais)
+    except ValueError as error:
+        print(f"Error: {error}")
+        return
+    if agregado:
+        programar_guardado(nombre_archivo, lista_paises) # Se guarda en segundo plano
+        print(f"\n¡País '{nombre}' agregado exitosamente!")
+    else:
+        print(f"\n¡País '{nombre}' agregado! Se guardará cuando termine la carga de datos.")
 
 def actualizar_datos_pais(lista_paises):
     """
@@ -219,8 +3156,9 @@ def actualizar_datos_pais(lista_paises):
 
     """
     print("\n--- 2. Actualizar Datos de un País ---")
-    mostrar_lista_paises(lista_paises)
-    nombre_buscado = input("Ingrese el nombre del paìs a actualizar: ").strip()
+    esperar_carga()
+    mostrar_lista_paises(list(paises_vigentes(lista_paises)))
+    nombre_buscado = pedir_nombre_pais("Ingrese el nombre del paìs a actualizar: ", lista_paises).strip()
     pais_encontrado = buscar_pais_por_nombre(lista_paises, nombre_buscado)
 
     if not pais_encontrado:
@@ -244,11 +3182,25 @@ def actualizar_datos_pais(lista_paises):
         if validar_cantidad(nueva_superficie_str):
             break
 
-    pais_encontrado["poblacion"] = int(nueva_poblacion_str)
-    pais_encontrado["superficie"] = int(nueva_superficie_str)
-    guardar_paises(nombre_archivo, lista_paises)
+    # Pedir el año de los datos, para el historial
+    anio_actual = datetime.date.today().year
+    anio_str = ""
+    while True:
+        anio_str = input(f"Ingrese el año de los nuevos datos (Enter para {anio_actual}): ").strip()
+        if not anio_str:
+            anio_str = str(anio_actual)
+            break
+        if validar_anio(anio_str):
+            break
+
+    vigente = registrar_cambio(lista_paises, pais_encontrado, int(nueva_poblacion_str), int(nueva_superficie_str), anio=int(anio_str))
+    programar_guardado(nombre_archivo, lista_paises)
 
-    print(f"Datos del país '{pais_encontrado['nombre']}' actualizados exitosamente.")
+    if vigente:
+        print(f"Datos del país '{pais_encontrado['nombre']}' actualizados exitosamente.")
+    else:
+        print(f"Datos de {anio_str} agregados al historial de '{pais_encontrado['nombre']}'. "
+              "Los datos actuales no cambian porque hay datos de años posteriores.")
 
 def buscar_pais(lista_paises):
     """
@@ -257,28 +3209,34 @@ def buscar_pais(lista_paises):
     """
     print("\n--- 3. Buscar un País ---")
 
-    pais_buscado = input("Ingrese el nombre del país a buscar: ").strip().lower()
+    pais_buscado = pedir_nombre_pais("Ingrese el nombre del país a buscar: ", lista_paises).strip().lower()
     if not pais_buscado:
         print("Error: El nombre no puede estar vacío.")
         return
     ## Buscamos el pais mediante una busqueda exacta usando una función previa
+    ## Si la carga sigue en curso y el país todavía no apareció, lo buscamos
+    ## directo en el archivo (si tiene índice de posiciones al día) o esperamos
     pais_exacto = buscar_pais_por_nombre(lista_paises, pais_buscado)
+    if not pais_exacto and not estado_carga["terminada"].is_set():
+        if indice_offsets_vigente(nombre_archivo):
+            pais_exacto = buscar_pais_en_archivo(nombre_archivo, pais_buscado)
+        if not pais_exacto:
+            esperar_carga()
+            pais_exacto = buscar_pais_por_nombre(lista_paises, pais_buscado)
     if pais_exacto:
         print(f"\nSe encontró 1 coincidencia exacta para '{pais_buscado}':")
         mostrar_lista_paises([pais_exacto])
+        ofrecer_exportacion([pais_exacto])
         return
     ## Si no hay coincidencia exacta, buscamos coincidencias parciales
     print(f"\nNo se encontró una coincidencia exacta para '{pais_buscado}'. Buscando coincidencias parciales...")
-    coincidencias = []
-    pais_buscado_lower = pais_buscado.lower()
-    for pais in lista_paises:
-        if pais_buscado_lower in pais["nombre"].lower():
-            coincidencias.append(pais)
-    
+    coincidencias = buscar_coincidencias_parciales(lista_paises, pais_buscado)
+
     ## Mosntrar resultados
     if coincidencias:
         print(f"\nSe encontraron {len(coincidencias)} coincidencias parciales para '{pais_buscado}':")
         mostrar_lista_paises(coincidencias)
+        ofrecer_exportacion(coincidencias)
     else:
         print(f"No se encontraron coincidencias para '{pais_buscado}'.")
 
@@ -291,28 +3249,71 @@ def filtrar_por_continente(lista_paises):
     if not continente_buscado:
         print("Error: El continente no puede estar vacío.")
         return
-    resultados =[]
-    for pais in lista_paises:
-        if pais['continente'].strip().lower() == continente_buscado.strip().lower():
-            resultados.append(pais)
+    ## Con fragmentos sólo hace falta el del continente pedido
+    if not asegurar_continente(lista_paises, continente_buscado):
+        esperar_carga()
+    resultados = buscar_por_continente(lista_paises, continente_buscado)
     mostrar_lista_paises(resultados)
+    ofrecer_exportacion(resultados)
 
 def filtrar_por_rango(lista_paises, clave, unidad):
     """
     Funcion para filtrar rangos númericos.
-    "clave" es el nombre del campo en el diccionario (poblacion o superficie).
-    "unidad" es el texto que se muestra al usuario (población o superficie).
+    "clave" es el nombre del campo en el diccionario (poblacion o superficie)
+    o de una columna derivada (densidad).
+    "unidad" es el texto que se muestra al usuario (población, superficie o densidad).
     """
     print(f"\n --- 4.2 Filtrar por Rango de {unidad.title()} ---")
     (min_val, max_val) = obtener_rango_numerico(unidad)
-    
-    resultados = []
-    for pais in lista_paises:
-        if min_val <= pais[clave] <= max_val:
-            resultados.append(pais)
-    mostrar_lista_paises(resultados)
+    esperar_carga()
+
+    resultados = buscar_por_rango(lista_paises, clave, min_val, max_val)
+    if clave in COLUMNAS_DERIVADAS:
+        mostrar_lista_paises(resultados, clave)
+    else:
+        mostrar_lista_paises(resultados)
+    ofrecer_exportacion(resultados)
+
+
+
+def filtrar_por_similitud(lista_paises, por_radio):
+    """
+    Busca los países más parecidos a uno en población y superficie:
+    los k más cercanos o, con "por_radio", todos los que están a menos
+    de una distancia (1 equivale a un factor de 10 en población o superficie).
+    Se puede limitar la búsqueda a un continente.
+    """
+    print("\n--- 4.5 Países Parecidos en Población y Superficie ---")
+    esperar_carga()
+    nombre_buscado = pedir_nombre_pais("Ingrese el país de referencia: ", lista_paises).strip()
+    pais_referencia = buscar_pais_por_nombre(lista_paises, nombre_buscado)
+    if not pais_referencia:
+        print(f"El país '{nombre_buscado}' no se encontró en la lista.")
+        return
+    continente = input("Continente donde buscar (Enter para todos): ").strip() or None
+    if continente is not None:
+        asegurar_continente(lista_paises, continente)
 
+    if por_radio:
+        radio_str = input("Distancia máxima (ej: 0.3, 1 = un factor de 10): ").strip()
+        try:
+            radio = float(radio_str)
+        except ValueError:
+            radio = -1
+        if radio < 0:
+            print("Error: La distancia debe ser un número positivo.")
+            return
+        encontrados = paises_dentro_de_radio(lista_paises, pais_referencia, radio, continente)
+    else:
+        cantidad_str = input("Cantidad de países a mostrar (Enter para 5): ").strip() or "5"
+        if not validar_cantidad(cantidad_str) or int(cantidad_str) == 0:
+            return
+        encontrados = paises_mas_parecidos(lista_paises, pais_referencia, int(cantidad_str), continente)
 
+    resultados = [pais for _, pais in encontrados]
+    print(f"\nPaíses parecidos a '{pais_referencia['nombre']}' (del más al menos parecido):")
+    mostrar_lista_paises(resultados)
+    ofrecer_exportacion(resultados)
 
 def filtrar_paises(lista_paises):
     """
@@ -323,10 +3324,13 @@ def filtrar_paises(lista_paises):
         print("1. Filtrar por Continente")
         print("2. Filtrar por Rango de Población")
         print("3. Filtrar por Rango de Superficie")
-        print("4. Volver al Menú Principal")
+        print("4. Filtrar por Rango de Densidad (hab/km²)")
+        print("5. Países más parecidos a uno (población y superficie)")
+        print("6. Países parecidos dentro de una distancia")
+        print("7. Volver al Menú Principal")
         print("-" * 34)
         
-        sub_opcion = input("Seleccione una opción de filtro (1-4): ")
+        sub_opcion = input("Seleccione una opción de filtro (1-7): ")
         
         match sub_opcion:
             case "1":
@@ -336,6 +3340,12 @@ def filtrar_paises(lista_paises):
             case "3":
                 filtrar_por_rango(lista_paises, "superficie", "superficie")
             case "4":
+                filtrar_por_rango(lista_paises, "densidad", "densidad")
+            case "5":
+                filtrar_por_similitud(lista_paises, por_radio=False)
+            case "6":
+                filtrar_por_similitud(lista_paises, por_radio=True)
+            case "7":
                 print("Volviendo al menú principal...")
                 break
             case _:
@@ -344,10 +3354,11 @@ def filtrar_paises(lista_paises):
 def ordenar_paises(lista_paises):
     """
     Muestra un sub-menú para elegir el criterio de ordenamiento.
-    (nombre, población, superficie) y la direccion (ascendente o descendente).
+    (nombre, población, superficie, densidad) y la direccion (ascendente o descendente).
     """
+    esperar_carga()
     ## crear una copia de la lista original para no modificarla
-    lista_para_ordenar = lista_paises.copy()
+    lista_para_ordenar = list(paises_vigentes(lista_paises))
     while True:
         print("\n--- 5. Ordenar Países ---")
         print("1. Por Nombre (A-Z)")
@@ -356,9 +3367,11 @@ def ordenar_paises(lista_paises):
         print("4. Por Población (Menor a Mayor)")
         print("5. Por Superficie (Mayor a Menor)")
         print("6. Por Superficie (Menor a Mayor)")
-        print("7. Volver al Menú Principal")
+        print("7. Por Densidad (Mayor a Menor)")
+        print("8. Por Densidad (Menor a Mayor)")
+        print("9. Volver al Menú Principal")
         print("-" * 34)
-        sub_opcion = input("Seleccione una opción de ordenamiento (1-7): ")
+        sub_opcion = input("Seleccione una opción de ordenamiento (1-9): ")
         lista_ordenada = []
 
         match sub_opcion:
@@ -400,60 +3413,69 @@ def ordenar_paises(lista_paises):
                 mostrar_lista_paises(lista_ordenada)
 
             case "7":
+                # Ordenar por Densidad (Mayor a Menor)
+                print("\nOrdenando por Densidad (Mayor a Menor)...")
+                lista_ordenada = sorted(lista_para_ordenar, key=obtener_densidad, reverse=True)
+                mostrar_lista_paises(lista_ordenada, "densidad")
+
+            case "8":
+                # Ordenar por Densidad (Menor a Mayor)
+                print("\nOrdenando por Densidad (Menor a Mayor)...")
+                lista_ordenada = sorted(lista_para_ordenar, key=obtener_densidad, reverse=False)
+                mostrar_lista_paises(lista_ordenada, "densidad")
+
+            case "9":
                 print("Volviendo al menú principal...")
                 break
             case _:
                 print("Opción no válida. Por favor, intente de nuevo.")
 
+        ## Si se ordenó la lista, ofrecemos exportarla
+        ofrecer_exportacion(lista_ordenada)
+
 def mostrar_estadisticas(lista_paises):
     """
-    Calcula y muestra estadísticas clave sobre la lista de países.
+    Calcula y muestra estadísticas clave sobre la lista de países,
+    a partir de los resúmenes por continente (sin recorrer los países,
+    salvo para la densidad, que se toma de las columnas derivadas).
     Los calculos que se realizan son:
-    - País con mayor población y menor población.
+    - País con mayor población (y su participación) y menor población.
+    - País con mayor y menor densidad.
     - Promedio de población.
     - Promedio de superficie.
-    - Cantidad de paises por continente.
+    - Resumen por continente (cantidad, población, superficie, densidad
+      y países extremos).
+    - Población y superficie totales por año, según el historial.
     """
     print("\n--- 6. Estadísticas de Países ---")
-    if not lista_paises:
+    esperar_carga()
+    ## Los totales y extremos globales salen de combinar los resúmenes por continente
+    asegurar_indices(lista_paises)
+    resumenes = list(indices["continentes"].values())
+    if not resumenes:
         print("No hay países cargados para mostrar estadísticas.")
         return
-    
-    ## Iniciamos las variables para los cálculos
-    
-    ## Para los mayores y menores, asignamos el primer país como referencia inicial y luego comparamos con los demás
-    pais_mayor_pob = lista_paises[0]
-    pais_menor_pob = lista_paises[0]
+
+    pais_mayor_pob = max((resumen["mayor"] for resumen in resumenes), key=obtener_poblacion)
+    pais_menor_pob = min((resumen["menor"] for resumen in resumenes), key=obtener_poblacion)
 
     ## Sumas para promedios
     total_poblacion = 0
     total_superficie = 0
+    cantidad_paises = 0
+    for resumen in resumenes:
+        total_poblacion = total_poblacion + resumen["poblacion_total"]
+        total_superficie = total_superficie + resumen["superficie_total"]
+        cantidad_paises = cantidad_paises + len(resumen["paises"])
 
-    ## conteo de países por continente
-    conteo_continentes = {}
-
-    for pais in lista_paises:
-        if pais['poblacion'] > pais_mayor_pob['poblacion']:
-            pais_mayor_pob = pais
-        if pais['poblacion'] < pais_menor_pob['poblacion']:
-            pais_menor_pob = pais
-    
-    ## Calcular sumas para el promedio
-        total_poblacion = total_poblacion + pais['poblacion']
-        total_superficie = total_superficie + pais['superficie']
-
-    ## conteo de países por continente
-        continente = pais['continente']
-        if continente in conteo_continentes:
-            conteo_continentes[continente] += 1
-        else:
-            conteo_continentes[continente] = 1
-    
     ## promedio
-    cantidad_paises = len(lista_paises)
     promedio_poblacion = total_poblacion / cantidad_paises
     promedio_superficie = total_superficie / cantidad_paises
 
+    ## Extremos de densidad (columna derivada, se calcula una vez por país)
+    pais_mayor_densidad = max(paises_vigentes(lista_paises), key=obtener_densidad)
+    pais_menor_densidad = min(paises_vigentes(lista_paises), key=obtener_densidad)
+
     ## Mostrar resultados
 
     print("\n" + "=" * 40)
@@ -464,7 +3486,8 @@ def mostrar_estadisticas(lista_paises):
     
     print("\n--- Población ---")
     print(f"País con MAYOR población:")
-    print(f"  -> {pais_mayor_pob['nombre']} ({pais_mayor_pob['poblacion']:,} hab.)")
+    print(f"  -> {pais_mayor_pob['nombre']} ({pais_mayor_pob['poblacion']:,} hab., "
+          f"{obtener_derivada(pais_mayor_pob, 'participacion'):.2f}% del total)")
     
     print(f"País con MENOR población:")
     print(f"  -> {pais_menor_pob['nombre']} ({pais_menor_pob['poblacion']:,} hab.)")
@@ -475,16 +3498,277 @@ def mostrar_estadisticas(lista_paises):
     print("\n--- Superficie ---")
     print(f"Promedio de superficie global:")
     print(f"  -> {promedio_superficie:,.2f} km²")
+
+    print("\n--- Densidad ---")
+    print(f"País con MAYOR densidad:")
+    print(f"  -> {pais_mayor_densidad['nombre']} ({obtener_densidad(pais_mayor_densidad):,.2f} hab/km²)")
+    print(f"País con MENOR densidad:")
+    print(f"  -> {pais_menor_densidad['nombre']} ({obtener_densidad(pais_menor_densidad):,.2f} hab/km²)")
     
-    print("\n--- Países por Continente ---")
-    for continente in conteo_continentes:
-        cantidad = conteo_continentes[continente]
-        print(f"  -> {continente}: {cantidad} país(es)")
-        
+    mostrar_resumen_continentes(lista_paises)
+    mostrar_evolucion()
+
     print("=" * 40)
 
     
 
+def comparar_archivos():
+    """
+    Compara dos archivos CSV de países y muestra las diferencias.
+    """
+    print("\n--- 7.1 Comparar dos Archivos CSV ---")
+    archivo_anterior = input("Ingrese el archivo CSV anterior: ").strip()
+    archivo_nuevo = input("Ingrese el archivo CSV nuevo: ").strip()
+    for archivo in (archivo_anterior, archivo_nuevo):
+        if not os.path.isfile(archivo):
+            print(f"Error: El archivo '{archivo}' no existe.")
+            return
+    mostrar_diferencias(calcular_diferencias(archivo_anterior, archivo_nuevo))
+
+def sincronizar_con_archivo(lista_paises):
+    """
+    Compara los países cargados con un archivo CSV nuevo y, si el
+    usuario confirma, aplica las diferencias.
+    """
+    print("\n--- 7.2 Sincronizar con un Archivo CSV ---")
+    archivo_nuevo = input("Ingrese el archivo CSV nuevo: ").strip()
+    if not os.path.isfile(archivo_nuevo):
+        print(f"Error: El archivo '{archivo_nuevo}' no existe.")
+        return
+    esperar_carga()
+    ## Sin todos los fragmentos, los países de los que faltan parecerían agregados
+    cargar_fragmentos_restantes(lista_paises)
+    diferencias = calcular_diferencias(lista_paises, archivo_nuevo)
+    mostrar_diferencias(diferencias)
+    if not diferencias['agregados'] and not diferencias['cambiados'] and not diferencias['eliminados']:
+        print("No hay cambios para aplicar.")
+        return
+    confirmacion = input("¿Aplicar los cambios? (s/n): ").strip().lower()
+    if confirmacion != "s":
+        print("No se aplicaron cambios.")
+        return
+    modificados = aplicar_diferencias(nombre_archivo, lista_paises, diferencias)
+    print(f"Se aplicaron {modificados} cambio(s).")
+
+def convertir_a_fragmentos(lista_paises):
+    """
+    Guarda los países cargados con almacenamiento por continente.
+    """
+    print("\n--- 7.3 Convertir a Almacenamiento por Continente ---")
+    directorio = input("Ingrese el directorio de destino: ").strip()
+    if not directorio:
+        print("Error: El directorio no puede estar vacío.")
+        return
+    if os.path.isfile(directorio):
+        print(f"Error: '{directorio}' es un archivo, no un directorio.")
+        return
+    esperar_carga()
+    try:
+        cantidad = particionar_paises(lista_paises, directorio)
+    except ValueError as error:
+        print(f"Error: {error}")
+        return
+    print(f"Se crearon {cantidad} fragmento(s) en '{directorio}'.")
+    print(f"Para usarlo, ejecute: python main.py {directorio} [continente ...]")
+
+def consultar_historial(lista_paises):
+    """
+    Muestra el historial de población y superficie de un país, completo
+    o entre dos años, o los valores vigentes en un año puntual.
+    """
+    print("\n--- 7.4 Historial de un País ---")
+    nombre = pedir_nombre_pais("Ingrese el nombre del país: ", lista_paises).strip()
+    esperar_carga()
+    serie_poblacion = obtener_serie(nombre, "poblacion")
+    serie_superficie = obtener_serie(nombre, "superficie")
+    if serie_poblacion is None and serie_superficie is None:
+        print(f"El país '{nombre}' no tiene historial.")
+        return
+    anio = input("Año puntual a consultar (Enter para ver el historial): ").strip()
+    if anio:
+        if not validar_anio(anio):
+            return
+        poblacion = valor_en_anio(serie_poblacion, int(anio)) if serie_poblacion is not None else None
+        superficie = valor_en_anio(serie_superficie, int(anio)) if serie_superficie is not None else None
+        if poblacion is None and superficie is None:
+            print(f"El historial de '{nombre}' empieza después de {anio}.")
+            return
+        print(f"\nDatos vigentes en {anio}:")
+        print(f"  Población: {f'{poblacion:,}' if poblacion is not None else '-'}")
+        print(f"  Superficie: {f'{superficie:,} km²' if superficie is not None else '-'}")
+        return
+    desde = input("Desde el año (Enter para el primero): ").strip()
+    hasta = input("Hasta el año (Enter para el último): ").strip()
+    if (desde and not validar_cantidad(desde)) or (hasta and not validar_cantidad(hasta)):
+        return
+    desde = int(desde) if desde else 0
+    hasta = int(hasta) if hasta else 10 ** 6
+
+    ## Unimos ambas series por año
+    filas = {}
+    for campo, serie in (("poblacion", serie_poblacion), ("superficie", serie_superficie)):
+        if serie is None:
+            continue
+        for anio, valor in valores_entre_anios(serie, desde, hasta):
+            filas.setdefault(anio, {})[campo] = valor
+    if not filas:
+        print("No hay datos en ese rango de años.")
+        return
+    print(f"\n{'Año':<6} | {'Población':>15} | {'Superficie (km²)':>16}")
+    print("-" * 44)
+    for anio in sorted(filas):
+        poblacion = filas[anio].get("poblacion")
+        superficie = filas[anio].get("superficie")
+        pob_formateada = f"{poblacion:,}" if poblacion is not None else "-"
+        sup_formateada = f"{superficie:,}" if superficie is not None else "-"
+        print(f"{anio:<6} | {pob_formateada:>15} | {sup_formateada:>16}")
+
+def actualizar_desde_archivo(lista_paises):
+    """
+    Pide un archivo CSV de cambios y actualiza todos los países de una vez.
+    """
+    print("\n--- 7.5 Actualización Masiva desde un Archivo CSV ---")
+    archivo_cambios = input("Ingrese el archivo CSV con columnas nombre, poblacion y superficie: ").strip()
+    if not os.path.isfile(archivo_cambios):
+        print(f"Error: El archivo '{archivo_cambios}' no existe.")
+        return
+    anio_actual = datetime.date.today().year
+    anio_str = input(f"Ingrese el año de los nuevos datos (Enter para {anio_actual}): ").strip()
+    if not anio_str:
+        anio_str = str(anio_actual)
+    elif not validar_anio(anio_str):
+        return
+    try:
+        resultado = actualizacion_masiva(lista_paises, archivo_cambios, int(anio_str))
+    except ValueError as error:
+        print(f"Error: {error}")
+        return
+
+    print(f"\nPaíses actualizados: {resultado['actualizados']}")
+    ## Para archivos grandes mostramos sólo los primeros problemas
+    if resultado['desconocidos']:
+        print(f"Nombres desconocidos: {len(resultado['desconocidos'])}")
+        for nombre in resultado['desconocidos'][:20]:
+            print(f"  -> {nombre}")
+    if resultado['invalidos']:
+        print(f"Filas inválidas: {len(resultado['invalidos'])}")
+        for numero_fila, nombre in resultado['invalidos'][:20]:
+            print(f"  -> Fila {numero_fila}: '{nombre}'")
+
+def estadisticas_de_archivo():
+    """
+    Calcula estadísticas aproximadas de un archivo recorriéndolo una sola
+    vez, sin cargarlo en memoria.
+    """
+    print("\n--- 7.7 Estadísticas Aproximadas de un Archivo ---")
+    archivo = input(f"Ingrese el archivo o directorio (Enter para '{nombre_archivo}'): ").strip()
+    if not archivo:
+        archivo = nombre_archivo
+        ## Para incluir los cambios de la sesión que todavía no se guardaron
+        vaciar_guardado()
+    if not os.path.isfile(archivo) and not es_particionado(archivo):
+        print(f"Error: El archivo '{archivo}' no existe.")
+        return
+    resultado = calcular_estadisticas_aproximadas(archivo)
+    mostrar_estadisticas_aproximadas(resultado)
+    if resultado["filas"] == 0:
+        return
+    ## Cualquier continente se puede consultar, aunque no esté entre los más frecuentes
+    while True:
+        continente = input("\nConsultar la frecuencia de un continente (Enter para terminar): ").strip()
+        if not continente:
+            break
+        print(f"  -> {continente}: ~{estimar_count_min(resultado['continentes'], continente):,} país(es)")
+
+def publicar_en_memoria(lista_paises):
+    """
+    Publica los países en memoria compartida para que otros procesos
+    los consulten sin cargar el archivo (ver conectar_vista).
+    """
+    print("\n--- 7.8 Publicar en Memoria Compartida ---")
+    if shared_memory is None:
+        print("Error: Esta instalación de Python no tiene memoria compartida.")
+        return
+    esperar_carga()
+    prefijo = memoria_compartida["prefijo"] or PREFIJO_MEMORIA
+    try:
+        version = publicar_paises(lista_paises, prefijo)
+    except OSError as error:
+        print(f"Error: No se pudo publicar en memoria compartida. {error}")
+        return
+    print(f"Países publicados como '{prefijo}' (versión {version}).")
+    print("Cada vez que se guarden cambios se publicará una versión nueva; al salir se retira.")
+
+def herramientas_datos(lista_paises):
+    """
+    Muestra un sub-menú con herramientas para trabajar con archivos de datos.
+    """
+    while True:
+        print("\n--- 7. Herramientas de Datos ---")
+        print("1. Comparar dos archivos CSV")
+        print("2. Sincronizar con un archivo CSV nuevo")
+        print("3. Convertir a almacenamiento por continente")
+        print("4. Ver historial de un país")
+        print("5. Actualización masiva desde un archivo CSV")
+        print("6. Ver uso de la caché de consultas")
+        print("7. Estadísticas aproximadas de un archivo grande")
+        print("8. Publicar los datos en memoria compartida")
+        print("9. Volver al Menú Principal")
+        print("-" * 34)
+
+        sub_opcion = input("Seleccione una opción (1-9): ")
+
+        match sub_opcion:
+            case "1":
+                comparar_archivos()
+            case "2":
+                sincronizar_con_archivo(lista_paises)
+            case "3":
+                convertir_a_fragmentos(lista_paises)
+            case "4":
+                consultar_historial(lista_paises)
+            case "5":
+                actualizar_desde_archivo(lista_paises)
+            case "6":
+                mostrar_uso_cache()
+            case "7":
+                estadisticas_de_archivo()
+            case "8":
+                publicar_en_memoria(lista_paises)
+            case "9":
+                print("Volviendo al menú principal...")
+                break
+            case _:
+                print("Opción no válida. Por favor, intente de nuevo.")
+
+def eliminar_pais(lista_paises):
+    """
+    Da de baja un país de la lista, pidiendo confirmación.
+    """
+    print("\n--- 8. Eliminar un País ---")
+    esperar_carga()
+    nombre_buscado = pedir_nombre_pais("Ingrese el nombre del país a eliminar: ", lista_paises).strip()
+    pais_encontrado = buscar_pais_por_nombre(lista_paises, nombre_buscado)
+    if not pais_encontrado:
+        print(f"El país '{nombre_buscado}' no se encontró en la lista.")
+        return
+    mostrar_lista_paises([pais_encontrado])
+    confirmacion = input(f"¿Eliminar '{pais_encontrado['nombre']}'? (s/n): ").strip().lower()
+    if confirmacion != "s":
+        print("No se eliminó el país.")
+        return
+    try:
+        compactar = registrar_baja(nombre_archivo, lista_paises, pais_encontrado)
+    except OSError as error:
+        print(f"Error: No se pudo registrar la baja. {error}")
+        return
+    ## La baja ya quedó anotada; el archivo se reescribe sólo al compactar
+    if compactar:
+        compactar_bajas(nombre_archivo, lista_paises)
+    else:
+        republicar(lista_paises)
+    print(f"\n¡País '{pais_encontrado['nombre']}' eliminado exitosamente!")
+
 def imprimir_menu():
     """
     Imprime el menú de opciones para el usuario.
@@ -499,14 +3783,34 @@ def imprimir_menu():
     print("4. Filtrar países")
     print("5. Ordenar países")
     print("6. Mostrar estadísticas")
-    print("7. Salir")
+    print("7. Herramientas de datos")
+    print("8. Eliminar un país")
+    print("9. Salir")
     print("-" * 34)
 
 def main():
-    paises = cargar_paises(nombre_archivo)
+    ## Uso: python main.py [archivo o directorio de datos] [continente ...]
+    ## Los continentes sólo se usan con almacenamiento por continente.
+    global nombre_archivo
+    if len(sys.argv) > 1:
+        nombre_archivo = sys.argv[1]
+    continentes = sys.argv[2:] or None
+    if continentes and not es_particionado(nombre_archivo):
+        print("Aviso: Los continentes sólo se usan con almacenamiento por continente. Se cargan todos los países.")
+        continentes = None
+
+    ## Los cambios se guardan en segundo plano: nos aseguramos de guardarlos
+    ## al salir, también si el programa termina por una excepción o SIGTERM.
+    ## atexit ejecuta al revés: primero se guarda y después se retira lo publicado.
+    atexit.register(retirar_publicacion)
+    atexit.register(vaciar_guardado)
+    signal.signal(signal.SIGTERM, manejar_sigterm)
+
+    ## La carga corre en segundo plano para mostrar el menú de inmediato
+    paises = iniciar_carga_en_segundo_plano(nombre_archivo, continentes)
     while True:
         imprimir_menu()
-        opcion = input("Seleccione una opción (1-7): ")
+        opcion = input("Seleccione una opción (1-9): ")
         match opcion:
             case "1":
                 agregar_pais(paises)
@@ -521,9 +3825,18 @@ def main():
             case "6":
                 mostrar_estadisticas(paises)
             case "7":
+                herramientas_datos(paises)
+            case "8":
+                eliminar_pais(paises)
+            case "9":
+                ## Esperamos la carga y el guardado para no perder cambios
+                esperar_carga()
+                vaciar_guardado()
                 print("¡Gracias por usar el programa :D!")
                 break
             case _:
-                print("Opción no válida. Por favor, seleccione una opción del 1 al 7.")
-            
-main()
\ No newline at end of file
+                print("Opción no válida. Por favor, seleccione una opción del 1 al 9.")
+
+
+if __name__ == "__main__":
+    main()
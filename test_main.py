@@ -0,0 +1,322 @@
+"""
+Pruebas de main.py. Se ejecutan con:
+
+    python -m unittest test_main
+"""
+import bisect
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import unittest
+
+import main
+
+
+def paises_de_prueba(cantidad, semilla=1):
+    """
+    Arma "cantidad" países con datos al azar (pero repetibles).
+    """
+    azar = random.Random(semilla)
+    continentes = ["América del Sur", "Asia", "Europa", "África", "Oceanía"]
+    return [
+        {
+            "nombre": f"País {numero}",
+            "poblacion": azar.randint(0, 10 ** 10),
+            "superficie": azar.randint(0, 10 ** 8),
+            "continente": azar.choice(continentes),
+        }
+        for numero in range(cantidad)
+    ]
+
+
+class PruebaConDirectorio(unittest.TestCase):
+    """
+    Base de las pruebas que escriben archivos: cada prueba usa su propio
+    directorio temporal.
+    """
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio.name, nombre)
+
+
+class PruebasExportacion(PruebaConDirectorio):
+
+    def test_binario_ida_y_vuelta(self):
+        ## Más de un bloque, y textos con comas, comillas y acentos
+        paises = paises_de_prueba(main.FILAS_POR_BLOQUE + 10)
+        paises[0]["nombre"] = 'Côte d\'Ivoire, "la costa"'
+        paises[1]["continente"] = "Continente nuevo 🌍"
+        for nombre in ("paises.bin", "paises.bin.gz"):
+            salida = self.ruta(nombre)
+            self.assertEqual(main.exportar_paises(iter(paises), salida), len(paises))
+            self.assertEqual(list(main.leer_paises_binario(salida)), paises)
+
+    def test_binario_vacio(self):
+        salida = self.ruta("vacio.bin")
+        self.assertEqual(main.exportar_paises([], salida), 0)
+        self.assertEqual(list(main.leer_paises_binario(salida)), [])
+
+    def test_binario_rechaza_otro_formato(self):
+        salida = self.ruta("paises.csv")
+        main.exportar_paises(paises_de_prueba(3), salida)
+        with self.assertRaises(ValueError):
+            list(main.leer_paises_binario(salida))
+
+    def test_csv_y_jsonl_ida_y_vuelta(self):
+        paises = paises_de_prueba(50)
+        paises[0]["nombre"] = 'Nombre, con "comillas"'
+        main.exportar_paises(paises, self.ruta("paises.csv"))
+        self.assertEqual(list(main.leer_paises(self.ruta("paises.csv"))), paises)
+        main.exportar_paises(paises, self.ruta("paises.jsonl"))
+        with open(self.ruta("paises.jsonl"), encoding="utf-8") as archivo:
+            self.assertEqual([json.loads(linea) for linea in archivo], paises)
+
+
+class PruebasIndiceOffsets(PruebaConDirectorio):
+
+    def setUp(self):
+        super().setUp()
+        self.archivo = self.ruta("paises.csv")
+        with open(self.archivo, mode="w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["nombre", "poblacion", "superficie", "continente"])
+            escritor.writerow(["Argentina", "45000000", "2780400", "América del Sur"])
+            escritor.writerow(['Nombre, con "comillas"', "1", "2", "Europa"])
+            escritor.writerow(["Dos\nlíneas", "3", "4", "Asia"])
+            escritor.writerow(["Chile", "no es un número", "5", "América del Sur"])
+            escritor.writerow(["Perú", "", "6", "América del Sur"])
+            escritor.writerow(["Chile", "19000000", "756102", "América del Sur"])
+            escritor.writerow(["Japón", "125000000", "377975", "Asia"])
+            escritor.writerow(["Argentina", "1", "1", "América del Sur"])
+
+    def buscar(self, nombre):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return main.buscar_pais_en_archivo(self.archivo, nombre)
+
+    def test_filas_con_comillas_y_saltos_de_linea(self):
+        self.assertEqual(self.buscar('nombre, con "COMILLAS"')["poblacion"], 1)
+        self.assertEqual(self.buscar("dos\nlíneas")["continente"], "Asia")
+        ## La fila siguiente a la de varias líneas también se ubica bien
+        self.assertEqual(self.buscar("Japón")["superficie"], 377975)
+
+    def test_coincide_con_leer_paises(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cargados = {pais["nombre"].lower(): pais for pais in main.leer_paises(self.archivo)}
+        for nombre, pais in cargados.items():
+            self.assertEqual(self.buscar(nombre), pais)
+        ## Vale la primera fila válida: la de Chile con datos no numéricos se omite
+        self.assertEqual(self.buscar("chile")["poblacion"], 19000000)
+        self.assertEqual(self.buscar("argentina")["poblacion"], 45000000)
+        self.assertIsNone(self.buscar("Perú"))
+        self.assertIsNone(self.buscar("Uruguay"))
+
+    def test_armar_el_indice_no_muestra_errores(self):
+        salida = io.StringIO()
+        with contextlib.redirect_stdout(salida):
+            main.construir_indice_offsets(self.archivo)
+        self.assertEqual(salida.getvalue(), "")
+        self.assertTrue(main.indice_offsets_vigente(self.archivo))
+
+    def test_se_rearma_si_el_csv_cambia(self):
+        self.assertIsNone(self.buscar("Uruguay"))
+        with open(self.archivo, mode="a", encoding="utf-8", newline="") as archivo:
+            csv.writer(archivo).writerow(["Uruguay", "3500000", "176215", "América del Sur"])
+        self.assertFalse(main.indice_offsets_vigente(self.archivo))
+        self.assertEqual(self.buscar("Uruguay")["poblacion"], 3500000)
+
+
+class PruebasSimilitud(PruebaConDirectorio):
+
+    def setUp(self):
+        super().setUp()
+        self.paises = paises_de_prueba(3000, semilla=7)
+        self.azar = random.Random(3)
+
+    def distancias_exactas(self, referencia, continente=None):
+        objetivo = main.coordenadas_similitud(referencia)
+        return sorted(
+            math.dist(main.coordenadas_similitud(pais), objetivo)
+            for pais in main.paises_vigentes(self.paises)
+            if pais is not referencia and (continente is None or pais["continente"] == continente)
+        )
+
+    def comparar_con_fuerza_bruta(self):
+        for continente in (None, "Asia"):
+            for _ in range(20):
+                referencia = self.azar.choice(list(main.paises_vigentes(self.paises)))
+                exactas = self.distancias_exactas(referencia, continente)
+                for cantidad in (1, 5, 30):
+                    obtenidas = main.paises_mas_parecidos(self.paises, referencia, cantidad, continente)
+                    for (distancia, _), esperada in zip(obtenidas, exactas[:cantidad]):
+                        self.assertAlmostEqual(distancia, esperada)
+                    self.assertEqual(len(obtenidas), min(cantidad, len(exactas)))
+                ## Un radio entre dos distancias, para no depender del redondeo en el borde
+                radio = (exactas[10] + exactas[11]) / 2
+                obtenidas = main.paises_dentro_de_radio(self.paises, referencia, radio, continente)
+                esperadas = [distancia for distancia in exactas if distancia <= radio]
+                self.assertEqual(len(obtenidas), len(esperadas))
+                for (distancia, _), esperada in zip(obtenidas, esperadas):
+                    self.assertAlmostEqual(distancia, esperada)
+
+    def test_arboles_recien_armados(self):
+        self.comparar_con_fuerza_bruta()
+
+    def test_despues_de_altas_cambios_y_bajas(self):
+        archivo = self.ruta("paises.csv")
+        main.asegurar_similitud(self.paises)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for pais in paises_de_prueba(500, semilla=8):
+                pais["nombre"] += " nuevo"
+                main.registrar_alta(self.paises, pais)
+            for pais in self.azar.sample(self.paises, 400):
+                main.registrar_cambio(self.paises, pais, self.azar.randint(0, 10 ** 10), self.azar.randint(0, 10 ** 8))
+            for pais in self.azar.sample(self.paises, 800):
+                if not pais.get("_baja"):
+                    main.registrar_baja(archivo, self.paises, pais)
+        self.comparar_con_fuerza_bruta()
+        ## Los dados de baja nunca aparecen
+        for distancia, pais in main.paises_mas_parecidos(self.paises, self.paises[0], 100):
+            self.assertFalse(pais.get("_baja"))
+
+
+class PruebasSketches(unittest.TestCase):
+
+    def setUp(self):
+        ## La compactación del KLL elige al azar qué mitad conserva
+        random.seed(11)
+        azar = random.Random(5)
+        self.valores = [int(azar.lognormvariate(15, 3)) for _ in range(200000)]
+
+    def test_error_de_rango_del_kll(self):
+        sketch = main.nuevo_kll()
+        for valor in self.valores:
+            main.agregar_kll(sketch, valor)
+        ## La memoria queda acotada, lejos de la cantidad de valores
+        self.assertLess(sum(len(nivel) for nivel in sketch["niveles"]), 10 * main.K_CUANTILES)
+
+        ordenados = sorted(self.valores)
+        total = len(ordenados)
+        fracciones = [numero / 100 for numero in range(1, 100)]
+        for fraccion, valor in zip(fracciones, main.cuantiles_kll(sketch, fracciones)):
+            ## El rango real del valor devuelto (los repetidos ocupan un intervalo)
+            desde = bisect.bisect_left(ordenados, valor) / total
+            hasta = bisect.bisect_right(ordenados, valor) / total
+            self.assertLessEqual(desde - 0.0165, fraccion)
+            self.assertGreaterEqual(hasta + 0.0165, fraccion)
+
+        limites = main.limites_logaritmicos(ordenados[0], ordenados[-1])
+        aproximado = main.histograma_kll(sketch, limites)
+        self.assertEqual(sum(aproximado), total)
+        for desde, hasta, cantidad in zip(limites, limites[1:], aproximado):
+            exacta = bisect.bisect_left(ordenados, hasta) - bisect.bisect_left(ordenados, desde)
+            self.assertLessEqual(abs(cantidad - exacta), 0.0165 * 2 * total)
+
+    def test_kll_exacto_con_pocos_valores(self):
+        sketch = main.nuevo_kll()
+        for valor in range(100, 0, -1):
+            main.agregar_kll(sketch, valor)
+        self.assertEqual(main.cuantiles_kll(sketch, [0.01, 0.5, 1.0]), [1, 50, 100])
+
+    def test_count_min_nunca_subestima(self):
+        sketch = main.nuevo_count_min()
+        azar = random.Random(2)
+        exactas = {}
+        for _ in range(50000):
+            continente = f"Continente {int(azar.paretovariate(1.2))}"
+            main.sumar_count_min(sketch, continente)
+            exactas[continente] = exactas.get(continente, 0) + 1
+        margen = math.e / main.ANCHO_CM * sketch["total"]
+        for continente, exacta in exactas.items():
+            estimada = main.estimar_count_min(sketch, continente)
+            self.assertGreaterEqual(estimada, exacta)
+            self.assertLessEqual(estimada, exacta + margen)
+        ## Los más frecuentes quedan entre los candidatos
+        mas_frecuentes = sorted(exactas, key=exactas.get, reverse=True)[:5]
+        for continente in mas_frecuentes:
+            self.assertIn(continente.lower(), sketch["candidatos"])
+
+
+class PruebasBajas(PruebaConDirectorio):
+
+    def setUp(self):
+        super().setUp()
+        self.archivo = self.ruta("paises.csv")
+        main.exportar_paises([
+            {"nombre": "Argentina", "poblacion": 45000000, "superficie": 2780400, "continente": "América del Sur"},
+            {"nombre": "Chile", "poblacion": 19000000, "superficie": 756102, "continente": "América del Sur"},
+            {"nombre": "Japón", "poblacion": 125000000, "superficie": 377975, "continente": "Asia"},
+            {"nombre": "Francia", "poblacion": 68000000, "superficie": 551695, "continente": "Europa"},
+            {"nombre": "Perú", "poblacion": 34000000, "superficie": 1285216, "continente": "América del Sur"},
+        ], self.archivo)
+        self.paises = self.cargar()
+
+    def cargar(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            paises = main.iniciar_carga_en_segundo_plano(self.archivo)
+            main.esperar_carga()
+        return paises
+
+    def dar_de_baja_argentina(self):
+        argentina = main.buscar_pais_por_nombre(self.paises, "Argentina")
+        main.registrar_cambio(self.paises, argentina, 46000000, 2780400)
+        return main.registrar_baja(self.archivo, self.paises, argentina)
+
+    def estadisticas(self):
+        salida = io.StringIO()
+        with contextlib.redirect_stdout(salida):
+            main.mostrar_estadisticas(self.paises)
+        return salida.getvalue()
+
+    def test_no_aparece_en_busquedas(self):
+        self.dar_de_baja_argentina()
+        self.assertIsNone(main.buscar_pais_por_nombre(self.paises, "argentina"))
+        self.assertEqual(main.buscar_coincidencias_parciales(self.paises, "argen"), [])
+        nombres = [pais["nombre"] for pais in main.buscar_por_continente(self.paises, "América del Sur")]
+        self.assertEqual(sorted(nombres), ["Chile", "Perú"])
+        ## Tampoco al buscar directo en el archivo, que todavía tiene la fila
+        self.assertIsNone(main.buscar_pais_en_archivo(self.archivo, "Argentina"))
+
+    def test_no_cuenta_en_estadisticas_ni_historial(self):
+        self.dar_de_baja_argentina()
+        self.assertEqual(main.poblacion_mundial(), 19000000 + 125000000 + 68000000 + 34000000)
+        self.assertEqual(main.totales_por_anio("poblacion"), [])
+        texto = self.estadisticas()
+        self.assertIn("Total de países en la lista: 4", texto)
+        self.assertNotIn("Argentina", texto)
+        self.assertNotIn("46,000,000", texto)
+
+    def test_sigue_oculto_al_volver_a_cargar(self):
+        ## El cambio quedó guardado en el historial, pero la baja no reescribe
+        ## ningún archivo: al cargar se usa el registro de bajas
+        argentina = main.buscar_pais_por_nombre(self.paises, "Argentina")
+        main.registrar_cambio(self.paises, argentina, 46000000, 2780400)
+        main.guardar_historial(self.archivo)
+        main.registrar_baja(self.archivo, self.paises, argentina)
+        self.paises = self.cargar()
+        self.assertIsNone(main.buscar_pais_por_nombre(self.paises, "Argentina"))
+        self.assertEqual(len(self.paises), 4)
+        self.assertIsNone(main.obtener_serie("Argentina", "poblacion"))
+
+    def test_compactar_reescribe_el_archivo(self):
+        self.assertTrue(self.dar_de_baja_argentina())
+        main.compactar_bajas(self.archivo, self.paises)
+        main.vaciar_guardado()
+        self.assertEqual(len(self.paises), 4)
+        self.assertFalse(os.path.exists(main.ruta_bajas(self.archivo)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            nombres = [pais["nombre"] for pais in main.leer_paises(self.archivo)]
+        self.assertNotIn("Argentina", nombres)
+        self.assertEqual(len(nombres), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()